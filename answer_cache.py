@@ -0,0 +1,87 @@
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+
+# Cache of assistant answers keyed by the normalised question and the current
+# knowledge-base version. Uploading or deleting a document bumps the version,
+# which makes every earlier answer unreachable (and it ages out via LRU/TTL).
+# Answers depend on a session's thread history, so callers only cache (and share)
+# a session's first question; follow-ups always run against their own thread.
+
+ANSWER_CACHE_TTL = int(os.getenv("ANSWER_CACHE_TTL", "900"))
+ANSWER_CACHE_MAX_ENTRIES = int(os.getenv("ANSWER_CACHE_MAX_ENTRIES", "256"))
+
+_lock = threading.Lock()
+_entries = OrderedDict()  # (kb_version, normalised query) -> (stored_at, answer)
+_kb_version = 0
+_stats = {"hits": 0, "misses": 0, "expired": 0, "invalidations": 0}
+
+
+def normalize_query(query):
+    """Lower-case, collapse whitespace and drop trailing punctuation."""
+    query = re.sub(r"\s+", " ", (query or "").strip().lower())
+    return query.rstrip(" ?.!")
+
+
+def kb_version():
+    with _lock:
+        return _kb_version
+
+
+def bump_version():
+    """Invalidate all cached answers; call whenever the vector store changes."""
+    global _kb_version
+    with _lock:
+        _kb_version += 1
+        _entries.clear()
+        _stats["invalidations"] += 1
+        return _kb_version
+
+
+def get(query):
+    """Return the cached answer for query, or None."""
+    normalized = normalize_query(query)
+    with _lock:
+        key = (_kb_version, normalized)
+        entry = _entries.get(key)
+        if entry is None:
+            _stats["misses"] += 1
+            return None
+        stored_at, answer = entry
+        if time.time() - stored_at > ANSWER_CACHE_TTL:
+            del _entries[key]
+            _stats["expired"] += 1
+            _stats["misses"] += 1
+            return None
+        _entries.move_to_end(key)
+        _stats["hits"] += 1
+        return answer
+
+
+def put(query, answer, version=None):
+    """
+    Cache an answer. Pass the `version` read before the upstream call so an
+    answer computed against an older knowledge base is never stored as current.
+    """
+    normalized = normalize_query(query)
+    with _lock:
+        if version is not None and version != _kb_version:
+            return
+        key = (_kb_version, normalized)
+        _entries[key] = (time.time(), answer)
+        _entries.move_to_end(key)
+        while len(_entries) > ANSWER_CACHE_MAX_ENTRIES:
+            _entries.popitem(last=False)
+
+
+def get_stats():
+    with _lock:
+        lookups = _stats["hits"] + _stats["misses"]
+        return dict(
+            _stats,
+            entries=len(_entries),
+            kb_version=_kb_version,
+            hit_rate=round(_stats["hits"] / lookups, 3) if lookups else 0.0,
+        )
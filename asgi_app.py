@@ -0,0 +1,548 @@
+import asyncio
+import contextlib
+import os
+import time
+import uuid
+
+import anyio
+from a2wsgi import WSGIMiddleware
+from starlette.applications import Starlette
+from starlette.concurrency import iterate_in_threadpool
+from starlette.responses import JSONResponse, StreamingResponse
+from starlette.routing import Mount, Route
+from werkzeug.datastructures import FileStorage
+
+import answer_cache
+import audio_preprocess
+import audio_store
+import flask_app
+import jobs
+import local_retrieval
+import openai_async
+import run_waiter
+import singleflight
+import thread_compaction
+import thread_registry
+import transcription_cache
+import tts_cache
+
+# Async (ASGI) serving mode: uvicorn asgi_app:app --host 0.0.0.0 --port 8501
+#
+# /search-ai-input, /search-ai-stream, /upload_audio and /upload_file are
+# served by coroutines that talk to OpenAI through one shared
+# httpx.AsyncClient, so a request waiting on a run holds no thread and one
+# process can keep hundreds of queries in flight. Runs are polled by
+# coroutines too (same intervals and deadlines as run_waiter, no poll
+# threads); SQLite and file I/O (registries, caches, uploads) go through
+# worker threads, never the event loop. Every other route is the
+# unchanged Flask app mounted underneath; both share the registries, caches
+# and job table in-process.
+
+ASYNC_THREAD_LOCK_POLL = 0.05
+
+reply_flight = singleflight.AsyncGroup("replies-async")
+transcription_flight = singleflight.AsyncGroup("transcriptions-async")
+thread_flight = singleflight.AsyncGroup("threads-async")
+upload_slots = asyncio.Semaphore(flask_app.UPLOAD_WORKERS)
+_background = set()  # strong references to running voice jobs
+
+
+# ---------- Sessions ----------
+
+def session_of(request):
+    """Return (session_id, is_new) from the same cookie the Flask app uses."""
+    session_id = request.cookies.get(flask_app.SESSION_COOKIE)
+    return (session_id, False) if session_id else (uuid.uuid4().hex, True)
+
+
+def with_session(response, session):
+    session_id, is_new = session
+    if is_new:
+        response.set_cookie(flask_app.SESSION_COOKIE, session_id, httponly=True, samesite="lax")
+    return response
+
+
+def respond(payload, session, status_code=200):
+    return with_session(JSONResponse(payload, status_code=status_code), session)
+
+
+# ---------- Assistants helpers ----------
+
+async def create_thread():
+    payload = {"tool_resources": {"file_search": {"vector_store_ids": [flask_app.VSTORE_ID]}}}
+    try:
+        response = await openai_async.post("/threads", beta=True, json=payload)
+    except Exception as e:
+        print(f"⚠️ Error: {e}")
+        return None
+    if response.status_code == 200:
+        thread_id = response.json().get("id")
+        print(f"✅ Thread created successfully. Thread ID: {thread_id}")
+        return thread_id
+    print(f"❌ Failed to create thread. Error: {response.text}")
+    return None
+
+
+async def get_thread_id(session_id):
+    """Return the session's thread, creating (once per session) on first use."""
+    thread_id = thread_registry.lookup(session_id)
+    if thread_id:
+        return thread_id
+
+    async def create():
+        existing = thread_registry.lookup(session_id)
+        if existing:
+            return existing
+        new_thread_id = await create_thread()
+        if new_thread_id:
+            # bind() rewrites thread.json
+            await anyio.to_thread.run_sync(thread_registry.bind, session_id, new_thread_id)
+        return new_thread_id
+
+    return await thread_flight.do(session_id or thread_registry.DEFAULT_SESSION, create)
+
+
+class thread_turn:
+    """
+    Async context manager around thread_registry.thread_lock: waits for its
+    turn without blocking the event loop, so runs started from the mounted
+    Flask routes and from coroutines still never overlap on one thread.
+    """
+
+    def __init__(self, thread_id):
+        self.lock = thread_registry.thread_lock(thread_id)
+
+    async def __aenter__(self):
+        while not self.lock.acquire(blocking=False):
+            await asyncio.sleep(ASYNC_THREAD_LOCK_POLL)
+
+    async def __aexit__(self, *exc):
+        self.lock.release()
+
+
+async def create_message(query, thread_id):
+    response = await openai_async.post(f"/threads/{thread_id}/messages", beta=True,
+                                       json={"role": "user", "content": query})
+    if response.status_code == 200:
+        return response.json()["id"]
+    print(f"❌ Failed to add message. Error: {response.text}")
+    return None
+
+
+async def run_assistant(thread_id):
+    response = await openai_async.post(f"/threads/{thread_id}/runs", beta=True,
+                                       json={"assistant_id": flask_app.ASSISTANT_ID})
+    if response.status_code == 200:
+        return response.json()["id"]
+    print(f"❌ Failed to run assistant. Error: {response.text}")
+    return None
+
+
+async def poll_run(thread_id, run_id, seconds, counts, stop_states=run_waiter.TERMINAL_STATES):
+    """
+    Poll a run with run_waiter's adaptive intervals until its status is in
+    stop_states; returns the run object, or None once `seconds` have passed.
+    """
+    deadline = time.time() + seconds
+    interval = run_waiter.RUN_POLL_FIRST_INTERVAL
+    while True:
+        await asyncio.sleep(max(0.0, min(interval, deadline - time.time())))
+        if time.time() >= deadline:
+            return None
+        interval = run_waiter.next_interval(interval)
+        counts["polls"] += 1
+        try:
+            response = await openai_async.get(f"/threads/{thread_id}/runs/{run_id}", beta=True)
+        except Exception as e:
+            print(f"⚠️ Failed to check run status: {e}")
+            counts["errors"] += 1
+            continue
+        if response.status_code != 200:
+            print(f"⚠️ Failed to check run status. Error: {response.text}")
+            counts["errors"] += 1
+            if 400 <= response.status_code < 500 and response.status_code != 429:
+                raise RuntimeError(f"Run {run_id} lookup failed: {response.status_code}")
+            continue
+        run = response.json()
+        if run.get("status") in stop_states:
+            return run
+
+
+async def cancel_and_wait(thread_id, run_id, counts=None):
+    """Coroutine run_waiter.cancel_and_wait: cancel, then poll until the run has stopped."""
+    try:
+        response = await openai_async.post(f"/threads/{thread_id}/runs/{run_id}/cancel", beta=True)
+        print(f"⚠️ Cancel requested for run {run_id}: {response.status_code}")
+    except Exception as e:
+        print(f"⚠️ Failed to cancel run {run_id}: {e}")
+    try:
+        run = await poll_run(thread_id, run_id, run_waiter.RUN_CANCEL_SETTLE_SECONDS,
+                             counts if counts is not None else {"polls": 0, "errors": 0})
+    except Exception as e:
+        run = None
+        print(f"⚠️ Run {run_id} may still be active: {e}")
+    else:
+        if run is None:
+            print(f"⚠️ Run {run_id} still active {run_waiter.RUN_CANCEL_SETTLE_SECONDS:g}s after cancel")
+    return run
+
+
+async def wait_for_run(thread_id, run_id, deadline=None):
+    """
+    Coroutine run_waiter.wait_for_run: a waiting run costs a sleeping task, not
+    a poll thread. Runs that hit the deadline or require action are cancelled
+    and settled before returning, as are runs whose caller goes away.
+    """
+    started = time.time()
+    counts = {"polls": 0, "errors": 0}
+    timed_out = False
+    try:
+        run = await poll_run(thread_id, run_id, deadline or run_waiter.RUN_DEADLINE_SECONDS, counts,
+                             run_waiter.TERMINAL_STATES + ("requires_action",))
+        if run is not None and run["status"] != "requires_action":
+            return run
+        # The assistant only uses file_search, so nothing here can submit tool outputs
+        timed_out = run is None
+        settled = await cancel_and_wait(thread_id, run_id, counts)
+        if timed_out:
+            raise run_waiter.RunTimeoutError(f"Run {run_id} exceeded its deadline")
+        return settled or run
+    except asyncio.CancelledError:
+        # Free the thread for the session's next run before the lock is released
+        with anyio.CancelScope(shield=True):
+            await cancel_and_wait(thread_id, run_id, counts)
+        raise
+    finally:
+        run_waiter.record_run(time.time() - started, counts["polls"], counts["errors"], timed_out)
+
+
+async def get_run_reply(thread_id, run_id):
+    """Text of the assistant message produced by this run."""
+    response = await openai_async.get(f"/threads/{thread_id}/messages", beta=True,
+                                      params={"limit": 3, "order": "desc", "run_id": run_id})
+    if response.status_code != 200:
+        print(f"⚠️ Failed to retrieve messages. Error: {response.text}")
+        return None
+    for message in response.json()["data"]:
+        if message["role"] == "assistant":
+            for part in message["content"]:
+                if part["type"] == "text" and "text" in part:
+                    return part["text"]["value"]
+            return None
+    return "❌ No response received from the assistant."
+
+
+async def fetch_openai_reply(user_query, session_id=None):
+    thread_id = await get_thread_id(session_id)
+    if not thread_id:
+        return None
+    async with thread_turn(thread_id):
+        if not await create_message(user_query, thread_id):
+            return None
+        run_started = time.perf_counter()
+        run_id = await run_assistant(thread_id)
+        if not run_id:
+            return None
+        try:
+            run = await wait_for_run(thread_id, run_id)
+        except Exception as e:
+            print(f"❌ {e}")
+            return None
+        if run.get("status") != "completed":
+            print(f"❌ Run did not complete. Status: {run.get('status')}")
+            return None
+        print("✅ Run completed successfully!")
+        thread_compaction.record_run(thread_id, run, time.perf_counter() - run_started)
+        reply = await get_run_reply(thread_id, run_id)
+    # Runs on the compaction pool, off the event loop
+    flask_app.compact_if_needed(session_id, thread_id)
+    return reply
+
+
+async def stream_run(user_query, thread_id):
+    """Async flask_app.stream_run: yield the assistant's text deltas from a streamed run."""
+    if not await create_message(user_query, thread_id):
+        raise RuntimeError("Failed to add message to thread")
+    payload = {"assistant_id": flask_app.ASSISTANT_ID, "stream": True}
+    run = flask_app.RunEvents(thread_id)
+    try:
+        async with openai_async.stream("POST", f"/threads/{thread_id}/runs", beta=True, json=payload) as response:
+            if response.status_code != 200:
+                await response.aread()
+                raise RuntimeError(f"Failed to start streamed run: {response.text}")
+            async for event, data in openai_async.iter_sse_events(response):
+                for delta in run.handle(event, data):
+                    yield delta
+                if run.done:
+                    break
+    finally:
+        if run.needs_cancel():
+            # Shielded: on client disconnect this runs inside a cancelled scope
+            with anyio.CancelScope(shield=True):
+                await cancel_and_wait(thread_id, run.run_id)
+
+
+async def stream_openai_reply(user_query, session_id=None):
+    """Async flask_app.stream_openai_reply."""
+    if flask_app.ANSWER_MODE == "local":
+        async for delta in iterate_in_threadpool(local_retrieval.stream_answer(user_query)):
+            yield delta
+        return
+    thread_id = await get_thread_id(session_id)
+    if not thread_id:
+        raise RuntimeError("No thread available for this session")
+    async with thread_turn(thread_id):
+        async for delta in stream_run(user_query, thread_id):
+            yield delta
+    flask_app.compact_if_needed(session_id, thread_id)
+
+
+async def fetch_and_cache_reply(user_query, session_id=None, shared=True):
+    version = answer_cache.kb_version()
+    if flask_app.ANSWER_MODE == "local":
+        answer = await anyio.to_thread.run_sync(local_retrieval.answer, user_query)
+    else:
+        answer = await fetch_openai_reply(user_query, session_id)
+    if shared and flask_app.is_cacheable_answer(answer):
+        answer_cache.put(user_query, answer, version)
+    return answer
+
+
+async def get_openai_reply(user_query, session_id=None):
+    """Async get_openai_reply: answer cache, then one coalesced upstream call per question."""
+    if not user_query:
+        return None
+    # Only first-turn questions are shared across sessions (see flask_app.shares_answers)
+    shared = await anyio.to_thread.run_sync(flask_app.shares_answers, session_id)
+    cached = answer_cache.get(user_query) if shared else None
+    if cached is not None:
+        print("✅ Answer served from cache")
+        flask_app.record_shared_answer(session_id, user_query, cached)
+        return cached
+    answer = await reply_flight.do(flask_app.reply_key(user_query, session_id, shared), fetch_and_cache_reply,
+                                   user_query, session_id, shared)
+    if shared:
+        flask_app.record_shared_answer(session_id, user_query, answer)
+    return answer
+
+
+# ---------- Audio helpers ----------
+
+async def request_transcription(audio_path):
+    try:
+        data = await anyio.Path(audio_path).read_bytes()
+        response = await openai_async.post(
+            "/audio/transcriptions",
+            files={"file": (os.path.basename(audio_path), data)},
+            data={"model": flask_app.WHISPER_MODEL, "language": flask_app.WHISPER_LANGUAGE},
+        )
+    except Exception as e:
+        print(f"❌ Error during audio transcription: {e}")
+        return None
+    if response.status_code == 200:
+        return response.json().get("text", "No transcription available.")
+    print(f"❌ Error transcribing audio. Status: {response.status_code}, Error: {response.text}")
+    return None
+
+
+async def transcribe_audio(audio_path):
+    try:
+        audio_hash = await anyio.to_thread.run_sync(flask_app.file_sha256, audio_path)
+    except OSError as e:
+        print(f"❌ Error reading audio for transcription: {e}")
+        return None
+    key = (audio_hash, flask_app.WHISPER_MODEL, flask_app.WHISPER_LANGUAGE)
+    cached = await anyio.to_thread.run_sync(transcription_cache.get, *key)
+    if cached is not None:
+        print("✅ Transcription served from cache")
+        return cached
+    return await transcription_flight.do(key, fetch_and_cache_transcription, audio_path, key)
+
+
+async def fetch_and_cache_transcription(audio_path, key):
+    started = time.perf_counter()
+    audio_path = await anyio.to_thread.run_sync(audio_preprocess.preprocess, audio_path)
+    if audio_path is None:
+        return None
+    text = await request_transcription(audio_path)
+    if text:
+        await anyio.to_thread.run_sync(transcription_cache.put, *key, text, time.perf_counter() - started)
+    return text
+
+
+async def generate_audio(text, voice="coral"):
+    """Async generate_audio: TTS cache first, otherwise /audio/speech; returns the cached path."""
+    if not text:
+        text = "Am not clear about the context."
+    key = tts_cache.cache_key(text, voice, flask_app.TTS_MODEL, flask_app.TTS_INSTRUCTIONS)
+    cached_path = await anyio.to_thread.run_sync(tts_cache.get_path, key)
+    if cached_path:
+        print(f"✅ Audio served from cache: {cached_path}")
+        return cached_path
+    try:
+        response = await openai_async.post("/audio/speech", json={
+            "model": flask_app.TTS_MODEL,
+            "input": text,
+            "voice": voice,
+            "instructions": flask_app.TTS_INSTRUCTIONS,
+            "response_format": "mp3",
+        })
+    except Exception:
+        return None
+    if response.status_code != 200:
+        return None
+    output_path = await anyio.to_thread.run_sync(tts_cache.put, key, response.content)
+    print(f"✅ Audio successfully generated and saved as {output_path}")
+    return output_path
+
+
+async def process_voice_job(job_id, audio_path, stream_tts=False, session_id=None):
+    """Coroutine version of flask_app.process_voice_job."""
+    jobs.update_job(job_id, status="transcribing")
+    transcribed_text = await transcribe_audio(audio_path)
+    if not flask_app.voice_job_transcribed(job_id, transcribed_text):
+        return
+
+    openai_response = await get_openai_reply(transcribed_text, session_id)
+    if not flask_app.voice_job_answered(job_id, openai_response, stream_tts):
+        return
+
+    tts_audio_path = await generate_audio(str(openai_response), voice="alloy")
+    flask_app.voice_job_synthesized(job_id, tts_audio_path)
+
+
+async def run_voice_job(job_id, *args):
+    try:
+        await process_voice_job(job_id, *args)
+    except Exception as e:
+        print(f"❌ Job {job_id} failed: {e}")
+        jobs.update_job(job_id, status="failed", error=str(e))
+    else:
+        if jobs.get_job(job_id)["status"] not in jobs.FINISHED_STATES:
+            jobs.update_job(job_id, status="completed")
+
+
+# ---------- Knowledge base uploads ----------
+
+async def upload_to_openai(upload, claimed):
+    """
+    flask_app.upload_to_openai in a worker thread: every size streams from the
+    spooled upload in constant memory, and deduplication shares the Flask
+    app's pending claims and file registry.
+    """
+    file = FileStorage(stream=upload.file, filename=upload.filename, content_type=upload.content_type)
+    async with upload_slots:
+        return await anyio.to_thread.run_sync(flask_app.upload_to_openai, file, claimed)
+
+
+# ---------- Routes ----------
+
+async def search_ai_input(request):
+    session = session_of(request)
+    try:
+        data = await request.json()
+        user_qry = data.get("user_query", "")
+        if not user_qry:
+            return respond({"status": "error", "message": "No query provided"}, session, 400)
+        response_data = await get_openai_reply(user_qry, session[0])
+        return respond({"status": "success", "data": response_data}, session)
+    except Exception as e:
+        return respond({"status": "error", "message": str(e)}, session, 500)
+
+
+async def search_ai_stream(request):
+    """Async /search-ai-stream: the assistant's answer as SSE text deltas."""
+    session = session_of(request)
+    data = await request.json() or {}
+    user_qry = data.get("user_query", "")
+    if not user_qry:
+        return respond({"status": "error", "message": "No query provided"}, session, 400)
+
+    shared = await anyio.to_thread.run_sync(flask_app.shares_answers, session[0])
+
+    async def generate():
+        cached = answer_cache.get(user_qry) if shared else None
+        if cached is not None:
+            flask_app.record_shared_answer(session[0], user_qry, cached)
+            yield flask_app.sse_event("delta", {"text": cached})
+            yield flask_app.sse_event("done", {"text": cached, "cached": True})
+            return
+        version = answer_cache.kb_version()
+        answer = []
+        try:
+            async for delta in stream_openai_reply(user_qry, session[0]):
+                answer.append(delta)
+                yield flask_app.sse_event("delta", {"text": delta})
+            full_answer = "".join(answer)
+            if shared and flask_app.is_cacheable_answer(full_answer):
+                answer_cache.put(user_qry, full_answer, version)
+            yield flask_app.sse_event("done", {"text": full_answer})
+        except Exception as e:
+            print(f"⚠️ Error while streaming reply: {e}")
+            yield flask_app.sse_event("error", {"message": str(e)})
+
+    response = StreamingResponse(generate(), media_type="text/event-stream",
+                                 headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+    return with_session(response, session)
+
+
+async def upload_audio(request):
+    session = session_of(request)
+    form = await request.form()
+    audio_file = form.get("audio")
+    if audio_file is None or isinstance(audio_file, str):
+        return respond({"status": "error", "message": "No audio file provided"}, session, 400)
+    _, audio_path = audio_store.new_file("webm")
+    async with await anyio.open_file(audio_path, "wb") as f:
+        while chunk := await audio_file.read(1024 * 1024):
+            await f.write(chunk)
+    stream_tts = form.get("tts_mode") == "stream"
+    try:
+        job_id = jobs.create_job(voice="alloy")
+    except jobs.QueueFullError:
+        return respond({"status": False, "message": "Server busy, please try again shortly."}, session, 503)
+    task = asyncio.create_task(run_voice_job(job_id, audio_path, stream_tts, session[0]))
+    _background.add(task)
+    task.add_done_callback(_background.discard)
+    return respond({"status": True, "job_id": job_id}, session, 202)
+
+
+async def process_upload(request):
+    """Async /upload_file: same per-file results and KE bookkeeping as the Flask route."""
+    try:
+        form = await request.form()
+        if "file" not in form:
+            return JSONResponse({"status": "error", "message": "No file part"})
+        files = [item for item in form.getlist("file") if not isinstance(item, str) and item.filename]
+        if not files:
+            return JSONResponse({"status": "error", "message": "No selected file"})
+
+        claimed = []
+        try:
+            results = await asyncio.gather(*(upload_to_openai(upload, claimed) for upload in files))
+            # One file-batch call, SQLite inserts and thread.json writes: off the event loop
+            return JSONResponse(await anyio.to_thread.run_sync(flask_app.finish_upload, results, claimed))
+        finally:
+            flask_app.release_ingest(claimed)
+
+    except Exception as e:
+        print(f"❌ Error during upload: {e}")
+        return JSONResponse({"status": "error", "message": str(e)}, status_code=500)
+
+
+@contextlib.asynccontextmanager
+async def lifespan(app):
+    yield
+    await openai_async.aclose()
+
+
+app = Starlette(
+    routes=[
+        Route("/search-ai-input", search_ai_input, methods=["POST"]),
+        Route("/search-ai-stream", search_ai_stream, methods=["POST"]),
+        Route("/upload_audio", upload_audio, methods=["POST"]),
+        Route("/upload_file", process_upload, methods=["POST"]),
+        Mount("/", app=WSGIMiddleware(flask_app.app)),
+    ],
+    lifespan=lifespan,
+)
@@ -0,0 +1,133 @@
+import os
+import threading
+import time
+from fractions import Fraction
+
+import numpy as np
+
+# Voice clips are cleaned up before they are sent to Whisper. The browser's
+# webm/opus recording is decoded in-process with PyAV, downmixed and resampled
+# to 16 kHz mono (all Whisper uses), leading/trailing silence is trimmed with
+# an energy VAD, and the result is re-encoded as low-bitrate Opus in Ogg.
+# Smaller uploads and shorter audio make every transcription faster.
+
+TARGET_RATE = 16000
+OPUS_BITRATE = int(os.getenv("PREPROCESS_OPUS_BITRATE", "24000"))
+VAD_THRESHOLD_DB = float(os.getenv("PREPROCESS_VAD_THRESHOLD_DB", "-45"))
+VAD_FRAME_MS = 20
+PAD_MS = int(os.getenv("PREPROCESS_PAD_MS", "200"))  # silence kept around the speech
+OPUS_FRAME_MS = 20
+
+_lock = threading.Lock()
+_stats = {"clips": 0, "silent": 0, "failed": 0, "input_bytes": 0, "output_bytes": 0,
+          "input_seconds": 0.0, "output_seconds": 0.0, "total_ms": 0.0}
+
+
+def decode_mono_16k(path):
+    """Decode any audio file PyAV can read into int16 mono samples at TARGET_RATE."""
+    import av
+    resampler = av.AudioResampler(format="s16", layout="mono", rate=TARGET_RATE)
+    chunks = []
+    with av.open(path) as container:
+        stream = container.streams.audio[0]
+        for frame in container.decode(stream):
+            for out in resampler.resample(frame):
+                chunks.append(out.to_ndarray().reshape(-1))
+    for out in resampler.resample(None):
+        chunks.append(out.to_ndarray().reshape(-1))
+    return np.concatenate(chunks).astype(np.int16) if chunks else np.zeros(0, dtype=np.int16)
+
+
+def speech_bounds(samples, rate=TARGET_RATE, threshold_db=VAD_THRESHOLD_DB, pad_ms=PAD_MS):
+    """
+    (start, end) sample indices of the voiced region, padded by pad_ms on each
+    side, or None when no frame is louder than threshold_db (dBFS).
+    """
+    frame = rate * VAD_FRAME_MS // 1000
+    count = len(samples) // frame
+    if count == 0:
+        return None
+    frames = samples[:count * frame].astype(np.float64).reshape(count, frame)
+    rms = np.sqrt(np.mean(frames ** 2, axis=1))
+    with np.errstate(divide="ignore"):
+        levels = 20 * np.log10(rms / 32768)
+    voiced = np.flatnonzero(levels > threshold_db)
+    if voiced.size == 0:
+        return None
+    pad = rate * pad_ms // 1000
+    start = max(0, voiced[0] * frame - pad)
+    end = min(len(samples), (voiced[-1] + 1) * frame + pad)
+    return start, end
+
+
+def encode_opus(samples, out_path, rate=TARGET_RATE, bitrate=OPUS_BITRATE):
+    """
+    Write int16 mono samples to an Ogg/Opus file. The muxer runs bitexact, so
+    the same samples always give the same bytes (no random Ogg serial number).
+    """
+    import av
+    frame_size = rate * OPUS_FRAME_MS // 1000
+    with av.open(out_path, "w", format="ogg", options={"fflags": "+bitexact"}) as container:
+        stream = container.add_stream("libopus", rate=rate)
+        stream.codec_context.layout = "mono"
+        stream.codec_context.bit_rate = bitrate
+        for offset in range(0, len(samples), frame_size):
+            chunk = samples[offset:offset + frame_size]
+            frame = av.AudioFrame.from_ndarray(chunk.reshape(1, -1), format="s16", layout="mono")
+            frame.sample_rate = rate
+            frame.pts = offset
+            frame.time_base = Fraction(1, rate)
+            for packet in stream.encode(frame):
+                container.mux(packet)
+        for packet in stream.encode(None):
+            container.mux(packet)
+
+
+def preprocess(path, out_path=None):
+    """
+    Trim, downmix/resample and re-encode a voice clip for transcription.
+
+    Returns the path of the compact .ogg file, None when the clip contains no
+    speech at all, or the original path if preprocessing fails (so the caller
+    can still transcribe it as-is).
+    """
+    started = time.perf_counter()
+    out_path = out_path or f"{os.path.splitext(path)[0]}.16k.ogg"
+    try:
+        samples = decode_mono_16k(path)
+        bounds = speech_bounds(samples)
+        if bounds is None:
+            with _lock:
+                _stats["clips"] += 1
+                _stats["silent"] += 1
+            print(f"⚠️ No speech detected in {path}")
+            return None
+        trimmed = samples[bounds[0]:bounds[1]]
+        encode_opus(trimmed, out_path)
+    except Exception as e:
+        with _lock:
+            _stats["failed"] += 1
+        print(f"⚠️ Audio preprocessing failed, sending original: {e}")
+        return path
+
+    with _lock:
+        _stats["clips"] += 1
+        _stats["input_bytes"] += os.path.getsize(path)
+        _stats["output_bytes"] += os.path.getsize(out_path)
+        _stats["input_seconds"] += len(samples) / TARGET_RATE
+        _stats["output_seconds"] += len(trimmed) / TARGET_RATE
+        _stats["total_ms"] += (time.perf_counter() - started) * 1000
+    return out_path
+
+
+def get_stats():
+    with _lock:
+        processed = _stats["clips"] - _stats["silent"]
+        return {
+            "clips": _stats["clips"],
+            "silent": _stats["silent"],
+            "failed": _stats["failed"],
+            "bytes_ratio": round(_stats["output_bytes"] / _stats["input_bytes"], 3) if _stats["input_bytes"] else 0.0,
+            "seconds_trimmed": round(_stats["input_seconds"] - _stats["output_seconds"], 2),
+            "avg_ms": round(_stats["total_ms"] / processed, 1) if processed else 0.0,
+        }
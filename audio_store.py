@@ -0,0 +1,159 @@
+import mimetypes
+import os
+import threading
+import time
+import uuid
+
+import tts_cache
+
+# Storage for voice recordings (and their preprocessed copies). Every file
+# gets a random ID, so concurrent requests never overwrite each other, and
+# lives in one of 256 shard directories (store/<2 hex>/<id>.<ext>) so no
+# directory grows large. A background thread enforces an age limit and a total
+# byte budget, deleting the oldest files first. Synthesized speech stays in
+# tts_cache, which is content-addressed and bounded on its own.
+
+AUDIO_ROOT = "audio_files"
+AUDIO_STORE_DIR = os.path.join(AUDIO_ROOT, "store")
+AUDIO_STORE_MAX_BYTES = int(os.getenv("AUDIO_STORE_MAX_BYTES", str(1024 * 1024 * 1024)))
+AUDIO_STORE_MAX_AGE = int(os.getenv("AUDIO_STORE_MAX_AGE", str(7 * 24 * 3600)))
+AUDIO_STORE_GC_INTERVAL = int(os.getenv("AUDIO_STORE_GC_INTERVAL", "300"))
+MIN_AGE_SECONDS = 120  # never collect a file a request may still be using
+LEGACY_PREFIXES = ("audio_", "response_")  # audio_{ts}.webm / response_{ts}.mp3 left in AUDIO_ROOT
+
+_lock = threading.Lock()
+_gc_thread = None
+_stats = {"created": 0, "gc_runs": 0, "deleted_files": 0, "deleted_bytes": 0,
+          "files": 0, "bytes": 0, "last_gc_ms": 0.0}
+
+
+def new_file(ext):
+    """Reserve a unique path for a new audio file; returns (audio_id, path)."""
+    audio_id = uuid.uuid4().hex
+    shard = os.path.join(AUDIO_STORE_DIR, audio_id[:2])
+    os.makedirs(shard, exist_ok=True)
+    with _lock:
+        _stats["created"] += 1
+    return audio_id, os.path.join(shard, f"{audio_id}.{ext.lstrip('.')}")
+
+
+def reference(path):
+    """Public reference for a file under AUDIO_ROOT (what /response.mp3?aud_path= takes)."""
+    return os.path.relpath(path, AUDIO_ROOT).replace(os.sep, "/")
+
+
+def resolve(ref):
+    """
+    Map a reference back to an existing file path, or None. References that
+    point outside AUDIO_ROOT (absolute paths, '..') are rejected.
+    """
+    if not ref:
+        return None
+    root = os.path.realpath(AUDIO_ROOT)
+    path = os.path.realpath(os.path.join(root, ref))
+    if os.path.commonpath([root, path]) != root or not os.path.isfile(path):
+        return None
+    return path
+
+
+def is_immutable(path):
+    """
+    True for files whose name is fixed to their content: uuid-named store files
+    are write-once and TTS cache files are named by their synthesis key.
+    """
+    return _is_under(path, AUDIO_STORE_DIR) or is_shared(path)
+
+
+def _is_under(path, directory):
+    directory = os.path.realpath(directory)
+    return os.path.commonpath([directory, os.path.realpath(path)]) == directory
+
+
+def is_shared(path):
+    """True for TTS cache files: synthesized answers, safe for shared caches."""
+    return _is_under(path, tts_cache.TTS_CACHE_DIR)
+
+
+def etag(path):
+    """Strong validator: file name plus size and mtime, so a rewritten file never matches."""
+    stat = os.stat(path)
+    name = os.path.splitext(os.path.basename(path))[0]
+    return f"{name}-{stat.st_size:x}-{stat.st_mtime_ns:x}"
+
+
+def mime_type(path):
+    guessed = mimetypes.guess_type(path)[0] or "audio/mpeg"
+    return guessed.replace("video/", "audio/", 1)  # .webm recordings are audio only
+
+
+def _scan():
+    """(mtime, size, path) for every collectable file: the shards plus legacy top-level files."""
+    entries = []
+    if os.path.isdir(AUDIO_STORE_DIR):
+        for shard in os.scandir(AUDIO_STORE_DIR):
+            if shard.is_dir():
+                for entry in os.scandir(shard.path):
+                    if entry.is_file():
+                        stat = entry.stat()
+                        entries.append((stat.st_mtime, stat.st_size, entry.path))
+    if os.path.isdir(AUDIO_ROOT):
+        for entry in os.scandir(AUDIO_ROOT):
+            if entry.is_file() and entry.name.startswith(LEGACY_PREFIXES):
+                stat = entry.stat()
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+    return entries
+
+
+def collect():
+    """One GC pass: drop files past AUDIO_STORE_MAX_AGE, then the oldest until under the byte budget."""
+    started = time.perf_counter()
+    now = time.time()
+    entries = sorted(_scan())
+    total = sum(size for _, size, _ in entries)
+    deleted_files = deleted_bytes = 0
+    for mtime, size, path in entries:
+        age = now - mtime
+        if age < MIN_AGE_SECONDS:
+            break  # sorted by age: everything after is newer
+        if age <= AUDIO_STORE_MAX_AGE and total <= AUDIO_STORE_MAX_BYTES:
+            break
+        try:
+            os.remove(path)
+        except OSError:
+            continue
+        total -= size
+        deleted_files += 1
+        deleted_bytes += size
+    with _lock:
+        _stats["gc_runs"] += 1
+        _stats["deleted_files"] += deleted_files
+        _stats["deleted_bytes"] += deleted_bytes
+        _stats["files"] = len(entries) - deleted_files
+        _stats["bytes"] = total
+        _stats["last_gc_ms"] = round((time.perf_counter() - started) * 1000, 1)
+    if deleted_files:
+        print(f"✅ Audio GC removed {deleted_files} file(s), {deleted_bytes / 1e6:.1f} MB")
+    return deleted_files
+
+
+def _run():
+    while True:
+        try:
+            collect()
+        except Exception as e:
+            print(f"⚠️ Audio GC failed: {e}")
+        time.sleep(AUDIO_STORE_GC_INTERVAL)
+
+
+def start_gc():
+    """Start the background GC thread (idempotent)."""
+    global _gc_thread
+    with _lock:
+        if _gc_thread is None or not _gc_thread.is_alive():
+            _gc_thread = threading.Thread(target=_run, name="audio-gc", daemon=True)
+            _gc_thread.start()
+
+
+def get_stats():
+    with _lock:
+        return dict(_stats, max_bytes=AUDIO_STORE_MAX_BYTES, max_age_seconds=AUDIO_STORE_MAX_AGE)
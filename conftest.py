@@ -0,0 +1,2 @@
+# test_audio.py is the Streamlit front end, not a test module
+collect_ignore = ["test_audio.py"]
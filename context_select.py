@@ -0,0 +1,104 @@
+import hashlib
+import math
+import os
+import re
+from collections import Counter
+
+# Query-time context assembly for the Streamlit assistant. Documents are cut
+# into overlapping word windows and indexed once with BM25; for each question
+# the best-scoring chunks are packed into the prompt up to a token budget, so
+# prompt size stays flat however large the board pack is.
+
+CONTEXT_TOKEN_BUDGET = int(os.getenv("CONTEXT_TOKEN_BUDGET", "3000"))
+CHUNK_WORDS = 220
+CHUNK_OVERLAP_WORDS = 40
+BM25_K1 = 1.5
+BM25_B = 0.75
+
+_TOKEN = re.compile(r"\w+")
+
+
+def estimate_tokens(text):
+    """Rough token count (~4 characters per token), good enough for budgeting."""
+    return max(1, math.ceil(len(text) / 4))
+
+
+def tokenize(text):
+    return _TOKEN.findall(text.lower())
+
+
+def chunk_document(text, chunk_words=CHUNK_WORDS, overlap=CHUNK_OVERLAP_WORDS):
+    words = text.split()
+    step = max(1, chunk_words - overlap)
+    return [" ".join(words[start:start + chunk_words]) for start in range(0, max(len(words) - overlap, 1), step)]
+
+
+def fingerprint(document_context):
+    """Stable hash of a {file_name: text} dict, used to rebuild the index only when uploads change."""
+    digest = hashlib.sha256()
+    for name in sorted(document_context):
+        digest.update(name.encode("utf-8"))
+        digest.update(b"\0")
+        digest.update(document_context[name].encode("utf-8"))
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+
+class BM25Index:
+    """In-memory BM25 over document chunks."""
+
+    def __init__(self, document_context):
+        self.chunks = []  # (source, text)
+        for source, text in document_context.items():
+            for chunk in chunk_document(text or ""):
+                if chunk.strip():
+                    self.chunks.append((source, chunk))
+        self.term_freqs = [Counter(tokenize(text)) for _, text in self.chunks]
+        self.lengths = [sum(tf.values()) for tf in self.term_freqs]
+        self.avg_length = (sum(self.lengths) / len(self.lengths)) if self.lengths else 0.0
+        doc_freq = Counter()
+        for tf in self.term_freqs:
+            doc_freq.update(tf.keys())
+        n = len(self.chunks)
+        self.idf = {term: math.log(1 + (n - df + 0.5) / (df + 0.5)) for term, df in doc_freq.items()}
+
+    def score(self, query):
+        """BM25 score of every chunk for the query, as a list aligned with self.chunks."""
+        terms = [term for term in set(tokenize(query)) if term in self.idf]
+        scores = []
+        for tf, length in zip(self.term_freqs, self.lengths):
+            norm = BM25_K1 * (1 - BM25_B + BM25_B * length / self.avg_length) if self.avg_length else BM25_K1
+            scores.append(sum(
+                self.idf[term] * tf[term] * (BM25_K1 + 1) / (tf[term] + norm)
+                for term in terms if term in tf
+            ))
+        return scores
+
+
+def select_context(index, query, token_budget=CONTEXT_TOKEN_BUDGET):
+    """
+    Pack the highest-scoring chunks into at most `token_budget` tokens.
+
+    Returns (context_text, sources) where sources lists the documents used,
+    in the order they appear in the prompt.
+    """
+    if index is None or not index.chunks:
+        return "", []
+    scores = index.score(query)
+    ranked = sorted(range(len(index.chunks)), key=lambda i: scores[i], reverse=True)
+
+    selected, used_tokens = [], 0
+    # Unmatched chunks (score 0) keep document order and only fill leftover budget
+    for i in ranked:
+        source, text = index.chunks[i]
+        block = f"[{source}]\n{text}"
+        cost = estimate_tokens(block)
+        if used_tokens + cost > token_budget:
+            continue
+        selected.append((i, source, block))
+        used_tokens += cost
+
+    # Keep document order within the prompt so adjacent chunks read naturally
+    selected.sort(key=lambda item: item[0])
+    sources = list(dict.fromkeys(source for _, source, _ in selected))
+    return "\n\n".join(block for _, _, block in selected), sources
@@ -0,0 +1,115 @@
+import hashlib
+import json
+import os
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from io import BytesIO
+
+# Document text extraction shared by the Streamlit app and the local index.
+# PDFs are spooled to a temp file once and split into page ranges extracted
+# in a process pool (tasks carry only the path and range), pages are
+# yielded in order as soon as they are ready, text is joined once at the end
+# (no quadratic string building), and results are cached on disk by content
+# hash so re-rendering the same documents does no extraction work at all.
+
+TEXT_CACHE_DIR = os.getenv("TEXT_CACHE_DIR", ".text_cache")
+EXTRACT_WORKERS = int(os.getenv("EXTRACT_WORKERS", str(os.cpu_count() or 2)))
+PAGES_PER_TASK = 8
+EXTRACTOR_VERSION = 1
+
+_pool = None
+_worker_reader = (None, None)  # (path, PdfReader) last parsed by this worker process
+
+
+def _get_pool():
+    global _pool
+    if _pool is None:
+        _pool = ProcessPoolExecutor(max_workers=EXTRACT_WORKERS)
+    return _pool
+
+
+def _page_texts(reader, start, stop):
+    return [reader.pages[i].extract_text() or "" for i in range(start, stop)]
+
+
+def _extract_pdf_pages(path, start, stop):
+    """Worker: text of pages [start, stop) of the PDF at path, parsed once per worker."""
+    global _worker_reader
+    import PyPDF2
+    if _worker_reader[0] != path:
+        _worker_reader = (path, PyPDF2.PdfReader(path))
+    return _page_texts(_worker_reader[1], start, stop)
+
+
+def _iter_pdf_pages(data):
+    import PyPDF2
+    reader = PyPDF2.PdfReader(BytesIO(data))
+    page_count = len(reader.pages)
+    if page_count <= PAGES_PER_TASK:
+        yield from _page_texts(reader, 0, page_count)
+        return
+    # Workers read the PDF from disk instead of each task pickling the whole document
+    with tempfile.NamedTemporaryFile(suffix=".pdf", delete=False) as f:
+        f.write(data)
+    pool = _get_pool()
+    futures = [
+        pool.submit(_extract_pdf_pages, f.name, start, min(start + PAGES_PER_TASK, page_count))
+        for start in range(0, page_count, PAGES_PER_TASK)
+    ]
+    try:
+        for future in futures:
+            yield from future.result()
+    finally:
+        for future in futures:
+            future.cancel()
+        os.remove(f.name)
+
+
+def _iter_uncached_pages(file_name, data):
+    lower = file_name.lower()
+    if lower.endswith(".pdf"):
+        yield from _iter_pdf_pages(data)
+    elif lower.endswith(".docx"):
+        import docx2txt
+        yield docx2txt.process(BytesIO(data)) or ""
+    else:
+        yield data.decode("utf-8")
+
+
+def content_hash(data):
+    return hashlib.sha256(data).hexdigest()
+
+
+def _cache_path(digest):
+    return os.path.join(TEXT_CACHE_DIR, f"{digest}.v{EXTRACTOR_VERSION}.json")
+
+
+def iter_document_pages(file_name, data):
+    """
+    Yield the text of each page (one item for DOCX/TXT) in order, from the
+    on-disk cache when this exact content was extracted before.
+    """
+    path = _cache_path(content_hash(data))
+    if os.path.exists(path):
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                yield from json.load(f)
+            return
+        except (OSError, ValueError):
+            pass  # unreadable cache entry: extract again
+
+    pages = []
+    for page in _iter_uncached_pages(file_name, data):
+        pages.append(page)
+        yield page
+
+    os.makedirs(TEXT_CACHE_DIR, exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(pages, f)
+    os.replace(tmp_path, path)
+
+
+def extract_document_text(file_name, data):
+    """Full text of a PDF, DOCX or UTF-8 text document given as bytes."""
+    return "\n".join(page for page in iter_document_pages(file_name, data) if page)
@@ -0,0 +1,135 @@
+import csv
+import os
+import sqlite3
+import threading
+import time
+
+# Registry of uploaded knowledge-base files, backed by SQLite in WAL mode.
+# Replaces the pandas round-trips over file_dataset.csv: lookups use indexes on
+# file_id, file_name and content_hash, and inserts/deletes are atomic even
+# with concurrent uploads. The CSV is imported once on first start.
+
+FILE_REGISTRY_DB = os.getenv("FILE_REGISTRY_DB", "file_registry.db")
+LEGACY_CSV_FILE = "file_dataset.csv"
+
+_local = threading.local()
+_init_lock = threading.Lock()
+_initialized = False
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS files (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    file_name TEXT NOT NULL,
+    file_id TEXT NOT NULL,
+    content_hash TEXT,
+    modified TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_files_file_id ON files (file_id);
+CREATE INDEX IF NOT EXISTS idx_files_file_name ON files (file_name);
+CREATE INDEX IF NOT EXISTS idx_files_content_hash ON files (content_hash);
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+"""
+
+
+def _connect():
+    conn = sqlite3.connect(FILE_REGISTRY_DB, timeout=30)
+    conn.row_factory = sqlite3.Row
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    return conn
+
+
+def _migrate_csv(conn):
+    """Import file_dataset.csv once; the CSV is left in place untouched."""
+    if conn.execute("SELECT 1 FROM meta WHERE key = 'csv_migrated'").fetchone():
+        return
+    imported = 0
+    if os.path.exists(LEGACY_CSV_FILE):
+        with open(LEGACY_CSV_FILE, newline="") as f:
+            for row in csv.DictReader(f):
+                row = {(k or "").strip(): (v or "").strip() for k, v in row.items()}
+                if row.get("file_name") and row.get("file_id"):
+                    conn.execute(
+                        "INSERT INTO files (file_name, file_id, modified) VALUES (?, ?, ?)",
+                        (row["file_name"], row["file_id"], row.get("modified") or time.strftime("%Y-%m-%d %H:%M:%S")),
+                    )
+                    imported += 1
+    conn.execute("INSERT INTO meta (key, value) VALUES ('csv_migrated', ?)", (time.strftime("%Y-%m-%d %H:%M:%S"),))
+    if imported:
+        print(f"✅ Migrated {imported} file record(s) from {LEGACY_CSV_FILE}")
+
+
+def get_connection():
+    """Per-thread connection; the schema and CSV migration run once per process."""
+    global _initialized
+    conn = getattr(_local, "conn", None)
+    if conn is None:
+        conn = _local.conn = _connect()
+    if not _initialized:
+        with _init_lock:
+            if not _initialized:
+                with conn:
+                    conn.executescript(_SCHEMA)
+                with conn:
+                    _migrate_csv(conn)
+                _initialized = True
+    return conn
+
+
+def add_file(file_name, file_id, content_hash=None):
+    """Record an uploaded file and return its row ID."""
+    conn = get_connection()
+    with conn:
+        cursor = conn.execute(
+            "INSERT INTO files (file_name, file_id, content_hash, modified) VALUES (?, ?, ?, ?)",
+            (file_name, file_id, content_hash, time.strftime("%Y-%m-%d %H:%M:%S")),
+        )
+    print(f"✅ File info saved to registry: {file_name} | File ID: {file_id}")
+    return cursor.lastrowid
+
+
+def list_files():
+    """All registered files (aliases), oldest first, as [{"alias_id", "file_name", "file_id"}]."""
+    rows = get_connection().execute("SELECT id AS alias_id, file_name, file_id FROM files ORDER BY id").fetchall()
+    return [dict(row) for row in rows]
+
+
+def get_by_hash(content_hash):
+    """The first record holding this content, or None."""
+    row = get_connection().execute(
+        "SELECT id, file_name, file_id, content_hash, modified FROM files WHERE content_hash = ? ORDER BY id LIMIT 1",
+        (content_hash,),
+    ).fetchone()
+    return dict(row) if row else None
+
+
+def get_alias(alias_id):
+    row = get_connection().execute(
+        "SELECT id, file_name, file_id, content_hash, modified FROM files WHERE id = ?", (alias_id,)
+    ).fetchone()
+    return dict(row) if row else None
+
+
+def delete_alias(alias_id):
+    """
+    Remove one name. Returns the number of aliases still pointing at the same
+    file_id, so callers delete the underlying file only when it reaches 0.
+    """
+    conn = get_connection()
+    with conn:
+        row = conn.execute("SELECT file_id FROM files WHERE id = ?", (alias_id,)).fetchone()
+        if row is None:
+            return None
+        conn.execute("DELETE FROM files WHERE id = ?", (alias_id,))
+        return conn.execute("SELECT COUNT(*) FROM files WHERE file_id = ?", (row["file_id"],)).fetchone()[0]
+
+
+def get_by_file_id(file_id):
+    row = get_connection().execute(
+        "SELECT id, file_name, file_id, content_hash, modified FROM files WHERE file_id = ? ORDER BY id LIMIT 1",
+        (file_id,),
+    ).fetchone()
+    return dict(row) if row else None
@@ -1,25 +1,52 @@
 import os
-from flask import Flask, request, jsonify, send_file
+from flask import Flask, request, jsonify, send_file, Response, stream_with_context
 #import speech_recognition as sr
 #from pydub import AudioSegment
-import openai, json 
-import requests
-from flask import send_from_directory, render_template
+import json 
+import openai_client
+import jobs
+import tts_stream
+import tts_cache
+import answer_cache
+import singleflight
+import hashlib
+import uuid
+import thread_registry
+import file_registry
+import upload_stream
+import ingestion_tracker
+import queue
+import run_waiter
+import local_retrieval
+import live_voice
+import audio_preprocess
+import transcription_cache
+import audio_store
+import thread_compaction
+from flask_socketio import SocketIO
+from concurrent.futures import Future, ThreadPoolExecutor
+from flask import send_from_directory, render_template, g, has_request_context
 import csv
-import pandas as pd   
+import threading
 
 openai_api_key = os.getenv("OPENAI_API_KEY")
 
-AUDIO_FOLDER = "audio_files"
+AUDIO_FOLDER = audio_store.AUDIO_ROOT
 #os.environ["OPENAI_API_KEY"] = openai_api_key
-CSV_FILE_LIST = "file_dataset.csv"
 VSTORE_ID = "vs_67e31b2e9d608191873d419b483bc1af"
 VSTORE_NAME="GovernaAI"
 ASSISTANT_ID = "asst_p5K27rbqbduOsrcadJtFDgkB"
 UPLOAD_FOLDER = "uploaded_files/"
 CSV_VOICE_FILE = "voice_records.csv"
 CSV_FILE = "file_dataset.csv"
-THREAD_FILE = "thread.json"
+TTS_MODEL = "gpt-4o-mini-tts"
+TTS_INSTRUCTIONS = "Speak in a cheerful and positive tone."
+WHISPER_MODEL = "whisper-1"
+WHISPER_LANGUAGE = "en"
+UPLOAD_WORKERS = int(os.getenv("UPLOAD_WORKERS", "8"))
+AUDIO_IMMUTABLE_MAX_AGE = 365 * 24 * 3600
+# "assistants" (default) runs the Assistants API; "local" answers from the local FAISS index
+ANSWER_MODE = os.getenv("ANSWER_MODE", "assistants")
 
 if not os.path.exists(UPLOAD_FOLDER):
     os.makedirs(UPLOAD_FOLDER)
@@ -33,6 +60,43 @@ if not os.path.exists(CSV_VOICE_FILE):
         writer.writerow(["username", "transcribed_text", "filename", "timestamp"])
 
 app = Flask(__name__,static_folder='static',template_folder='templates')
+# Behind nginx/Apache with X-Sendfile enabled, the front server streams audio files itself
+app.config["USE_X_SENDFILE"] = os.getenv("USE_X_SENDFILE", "false").lower() in ("1", "true", "yes")
+
+reply_flight = singleflight.Group("replies")
+transcription_flight = singleflight.Group("transcriptions")
+# sha256 -> Future(file_id), claimed before the upload starts and released once the
+# owning request has registered the file, so identical content is uploaded once
+pending_ingest = {}
+pending_ingest_lock = threading.Lock()
+upload_executor = ThreadPoolExecutor(max_workers=UPLOAD_WORKERS, thread_name_prefix="kb-upload")
+seed_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="thread-seed")
+socketio = SocketIO(app)
+audio_store.start_gc()
+live_sessions = {}  # socket sid -> live_voice.LiveSession
+
+if ANSWER_MODE == "local":
+    # Catch up on documents uploaded while local mode was off
+    upload_executor.submit(lambda: local_retrieval.sync(file_registry.list_files(), UPLOAD_FOLDER))
+
+@app.route('/metrics', methods=['GET'])
+def metrics():
+    return jsonify({
+        "openai_endpoints": openai_client.get_stats(),
+        "jobs": jobs.get_stats(),
+        "tts_cache": tts_cache.get_stats(),
+        "answer_cache": answer_cache.get_stats(),
+        "coalescing": singleflight.get_stats(),
+        "threads": thread_registry.get_stats(),
+        "ingestion": ingestion_tracker.get_stats(),
+        "runs": run_waiter.get_stats(),
+        "local_index": local_retrieval.get_stats(),
+        "live_voice": live_voice.get_stats(),
+        "audio_preprocess": audio_preprocess.get_stats(),
+        "transcription_cache": transcription_cache.get_stats(),
+        "audio_store": audio_store.get_stats(),
+        "thread_compaction": thread_compaction.get_stats(),
+    }), 200
 
 @app.route('/')
 def home():
@@ -49,71 +113,253 @@ def searchAIInput():
             return jsonify({"status": "error", "message": "No query provided"}), 400
         
         #response_data = f"Searching for: {user_qry}" 
-        response_data = get_openai_reply(user_qry)
+        response_data = get_openai_reply(user_qry, current_session_id())
         print(response_data)
         return jsonify({"status": "success", "data": response_data})
 
     except Exception as e:
         return jsonify({"status": "error", "message": str(e)}), 500
-    
 
-def load_uploaded_files():
-    """Load and return the file list from the CSV."""
-    if os.path.exists(CSV_FILE_LIST):
-        try:
-            filedf = pd.read_csv(CSV_FILE_LIST)
-            filedf.columns = filedf.columns.str.strip()
 
-            # Return the list if valid columns exist and the file is not empty
-            if {"file_name", "file_id"}.issubset(filedf.columns) and not filedf.empty:
-                return filedf[["file_name", "file_id"]].to_dict(orient="records")
+def sse_event(event, payload):
+    """Format one Server-Sent Event frame with a JSON payload."""
+    return f"event: {event}\ndata: {json.dumps(payload)}\n\n"
+
+@app.route('/search-ai-stream', methods=["POST"])
+def searchAIStream():
+    """Stream the assistant's answer to the browser as SSE text deltas."""
+    data = request.json or {}
+    user_qry = data.get("user_query", "")
+    if not user_qry:
+        return jsonify({"status": "error", "message": "No query provided"}), 400
+    session_id = current_session_id()
+    shared = shares_answers(session_id)
+
+    def generate():
+        cached = answer_cache.get(user_qry) if shared else None
+        if cached is not None:
+            record_shared_answer(session_id, user_qry, cached)
+            yield sse_event("delta", {"text": cached})
+            yield sse_event("done", {"text": cached, "cached": True})
+            return
+        version = answer_cache.kb_version()
+        answer = []
+        try:
+            for delta in stream_openai_reply(user_qry, session_id):
+                answer.append(delta)
+                yield sse_event("delta", {"text": delta})
+            full_answer = "".join(answer)
+            if shared and is_cacheable_answer(full_answer):
+                answer_cache.put(user_qry, full_answer, version)
+            yield sse_event("done", {"text": full_answer})
         except Exception as e:
-            print(f"Error reading CSV: {str(e)}")
+            print(f"⚠️ Error while streaming reply: {e}")
+            yield sse_event("error", {"message": str(e)})
+
+    return Response(
+        stream_with_context(generate()),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+    
 
-    # Return empty list if no file or error
-    return []
+def load_uploaded_files():
+    """Return the registered knowledge-base files as [{"file_name", "file_id"}]."""
+    try:
+        return file_registry.list_files()
+    except Exception as e:
+        print(f"Error reading file registry: {str(e)}")
+        return []
 
 @app.route('/list_all_file', methods=['GET'])
 def list_all_file():
-    return jsonify({"status": "success", "data": load_uploaded_files()}), 200
+    files = load_uploaded_files()
+    for item in files:
+        # Files not tracked in this process were ingested before it started
+        item["status"] = ingestion_tracker.get_status(item["file_id"]) or "completed"
+    return jsonify({"status": "success", "data": files}), 200
+
+@app.route('/file_status_stream', methods=['GET'])
+def file_status_stream():
+    """Push vector-store ingestion status changes to the file table as SSE."""
+    events = ingestion_tracker.subscribe()
+
+    def generate():
+        try:
+            while True:
+                try:
+                    yield sse_event("status", events.get(timeout=15))
+                except queue.Empty:
+                    yield ": keep-alive\n\n"
+        finally:
+            ingestion_tracker.unsubscribe(events)
+
+    return Response(
+        generate(),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
 
 @app.route('/upload_audio', methods=['POST'])
 def upload_audio():
+    """Save the recording and queue the transcribe -> reply -> synthesize job."""
     if 'audio' not in request.files:
         return jsonify({"status": "error", "message": "No audio file provided"}), 400
     audio_file = request.files['audio']
-    timestamp = int(time.time())
-    audio_path = os.path.join(AUDIO_FOLDER, f"audio_{timestamp}.webm")
+    # Unique, sharded path: recordings arriving in the same second no longer collide
+    _, audio_path = audio_store.new_file("webm")
     # Save audio locally
     audio_file.save(audio_path)
+    # tts_mode=stream skips whole-file synthesis; the client plays /response_stream.mp3 instead
+    stream_tts = request.form.get("tts_mode") == "stream"
+    try:
+        job_id = jobs.submit_job(process_voice_job, audio_path, stream_tts, current_session_id(), voice="alloy")
+    except jobs.QueueFullError:
+        return jsonify({"status": False, "message": "Server busy, please try again shortly."}), 503
+    return jsonify({"status": True, "job_id": job_id}), 202
+
+
+@app.route('/audio_job/<job_id>', methods=['GET'])
+def audio_job_status(job_id):
+    """Report a voice job's progress; fields fill in as each stage finishes."""
+    job = jobs.get_job(job_id)
+    if job is None:
+        return jsonify({"status": False, "message": "Unknown job."}), 404
+    return jsonify({"status": True, "data": job}), 200
+
+
+def process_voice_job(job_id, audio_path, stream_tts=False, session_id=None):
+    """Worker body for /upload_audio: transcribe, answer, then synthesize speech."""
+    jobs.update_job(job_id, status="transcribing")
     #recognized_text = process_audio(audio_path)
     transcribed_text = transcribe_audio(audio_path)
-    if not transcribed_text:
-        return jsonify({"error": "Error transcribing audio"}), 500
-    
-    openai_response = get_openai_reply(transcribed_text)
+    if not voice_job_transcribed(job_id, transcribed_text):
+        return
+
+    openai_response = get_openai_reply(transcribed_text, session_id)
     print("Open AI response", openai_response)
+    if not voice_job_answered(job_id, openai_response, stream_tts):
+        return
+
+    tts_audio_path = generate_audio(str(openai_response), voice="alloy")
+    #save_record_to_csv("mainadmin", str(openai_response), fileName, timestamp)
+    voice_job_synthesized(job_id, tts_audio_path)
 
-    #timestamp = int(time.time())
-    #unique_filename = f"{AUDIO_FOLDER}/response_{timestamp}.mp3"
-    fileName = f"response_{timestamp}.mp3"
-    unique_filename = os.path.join(AUDIO_FOLDER, fileName)
-    tts_audio_path = generate_audio(str(openai_response), unique_filename, voice="alloy")
+# Voice-job stage transitions, shared with the ASGI app's coroutine job
+
+def voice_job_transcribed(job_id, transcribed_text):
+    """Record the transcription; False (job failed) if there is none."""
+    if not transcribed_text:
+        jobs.update_job(job_id, stage="transcribe", status="failed", error="Error transcribing audio")
+        return False
+    jobs.update_job(job_id, stage="transcribe", status="answering", input_transcription=transcribed_text)
+    return True
+
+def voice_job_answered(job_id, answer, stream_tts):
+    """Record the answer; False when the job is done (the TTS is streamed on request instead)."""
+    if stream_tts:
+        jobs.update_job(job_id, stage="answer", status="completed", output_transcription=str(answer),
+                        stream_url=f"/response_stream.mp3?job_id={job_id}")
+        return False
+    jobs.update_job(job_id, stage="answer", status="synthesizing", output_transcription=str(answer))
+    return True
+
+def voice_job_synthesized(job_id, tts_audio_path):
     if not tts_audio_path:
-        return jsonify({"error": "Error generating audio"}), 500
-    #save_record_to_csv("mainadmin", str(openai_response), unique_filename, timestamp)
-    return jsonify({"status": True, "filename":fileName, "output_transcription":str(openai_response), "input_transcription":transcribed_text}), 200
+        jobs.update_job(job_id, stage="synthesize", status="failed", error="Error generating audio")
+        return
+    # Cached audio lives under AUDIO_FOLDER, so /response.mp3 can serve it by reference
+    jobs.update_job(job_id, stage="synthesize", status="completed", filename=audio_store.reference(tts_audio_path))
 
 
-def get_thread_id():
-    if os.path.exists(THREAD_FILE):
-        with open(THREAD_FILE, "r") as f:
-            thread_data = json.load(f)
-            return thread_data.get("thread_id")
-    return None
+SESSION_COOKIE = "governa_sid"
+
+@app.before_request
+def load_session_id():
+    """Identify the browser session so each one gets its own Assistants thread."""
+    g.session_id = request.cookies.get(SESSION_COOKIE)
+    g.new_session = not g.session_id
+    if g.new_session:
+        g.session_id = uuid.uuid4().hex
+
+@app.after_request
+def save_session_id(response):
+    if getattr(g, "new_session", False):
+        response.set_cookie(SESSION_COOKIE, g.session_id, httponly=True, samesite="Lax")
+    return response
+
+def current_session_id():
+    return getattr(g, "session_id", None) if has_request_context() else None
 
-def get_openai_reply(user_query):
-    thread_id = get_thread_id()
+def get_thread_id(session_id=None):
+    """Return the session's thread, creating one on first use."""
+    return thread_registry.get_or_create(session_id, create_thread)
+
+def is_cacheable_answer(answer):
+    return isinstance(answer, str) and answer.strip() != "" and not answer.startswith("❌")
+
+def shares_answers(session_id):
+    """
+    Whether this session's next answer may be shared with other sessions.
+
+    Answers depend on the session's thread history, so only a session's first
+    question (no thread yet) is served from the answer cache and coalesced
+    across sessions. Follow-ups such as "tell me more about that" are never
+    cached and only coalesce with the same thread's own double-submits. The
+    trade-off: repeated follow-ups always cost a run. Local mode is stateless,
+    so everything is shared there.
+    """
+    return ANSWER_MODE == "local" or thread_registry.lookup(session_id) is None
+
+def reply_key(user_query, session_id, shared):
+    """Single-flight key: global for shareable questions, per thread otherwise."""
+    normalized = answer_cache.normalize_query(user_query)
+    return normalized if shared else (thread_registry.lookup(session_id), normalized)
+
+def record_shared_answer(session_id, user_query, answer):
+    """
+    A first question answered from the cache or by another session's run never
+    reached this session's thread. Start the thread (in the background) seeded
+    with that turn, so follow-ups still have its context.
+    """
+    if ANSWER_MODE == "local" or not is_cacheable_answer(answer) or thread_registry.lookup(session_id):
+        return
+    seed = [{"role": "user", "content": user_query}, {"role": "assistant", "content": answer}]
+    seed_executor.submit(thread_registry.get_or_create, session_id, lambda: create_thread(seed_messages=seed))
+
+def get_openai_reply(user_query, session_id=None):
+    """Answer a query, serving repeats from the answer cache for the current KB version."""
+    if not user_query:
+        return None
+    shared = shares_answers(session_id)
+    cached = answer_cache.get(user_query) if shared else None
+    if cached is not None:
+        print("✅ Answer served from cache")
+        record_shared_answer(session_id, user_query, cached)
+        return cached
+    # Identical questions asked at the same moment wait on a single run
+    answer = reply_flight.do(reply_key(user_query, session_id, shared), fetch_and_cache_reply,
+                             user_query, session_id, shared)
+    if shared:
+        # No-op for the session whose thread ran the question
+        record_shared_answer(session_id, user_query, answer)
+    return answer
+
+def fetch_and_cache_reply(user_query, session_id=None, shared=True):
+    version = answer_cache.kb_version()
+    if ANSWER_MODE == "local":
+        answer = local_retrieval.answer(user_query)
+    else:
+        answer = fetch_openai_reply(user_query, session_id)
+    if shared and is_cacheable_answer(answer):
+        answer_cache.put(user_query, answer, version)
+    return answer
+
+def fetch_openai_reply(user_query, session_id=None):
+    thread_id = get_thread_id(session_id)
+    msg_object = None
+    if not thread_id:
+        return None
     if user_query:
         #assistantid = create_assistant()
         #print(assistantid)
@@ -122,17 +368,22 @@ def get_openai_reply(user_query):
         #print(threadid)
         #return threadid
         #return {}
-        #Adds the user query to the thread.
-        message_id = create_message(user_query,thread_id )
-        #1. Run the Assistant After Adding a Message
-        run_id = run_assistant( thread_id, ASSISTANT_ID)
-        #2. Check Run Status Until Completion
-        run_status = check_run_status( thread_id, run_id)
-        #3. Retrieve Assistant’s Response
-        if run_status:
-            recent_messages = get_all_messages_from_thread(thread_id)
-            
-            msg_object = recent_messages
+        # Only one run may be active per thread, so queue behind any in progress
+        with thread_registry.thread_lock(thread_id):
+            #Adds the user query to the thread.
+            message_id = create_message(user_query,thread_id )
+            #1. Run the Assistant After Adding a Message
+            run_started = time.perf_counter()
+            run_id = run_assistant( thread_id, ASSISTANT_ID)
+            #2. Check Run Status Until Completion
+            run = wait_for_completed_run( thread_id, run_id)
+            #3. Retrieve Assistant’s Response
+            if run:
+                thread_compaction.record_run(thread_id, run, time.perf_counter() - run_started)
+                recent_messages = get_all_messages_from_thread(thread_id, run_id)
+                
+                msg_object = recent_messages
+        compact_if_needed(session_id, thread_id)
         if msg_object:
             return msg_object
         else:
@@ -140,37 +391,98 @@ def get_openai_reply(user_query):
     else:
         return None
 
+def stream_openai_reply(user_query, session_id=None):
+    """
+    Add the query to the thread and start a streamed run, yielding the
+    assistant's text deltas as they arrive instead of polling for completion.
+    """
+    if ANSWER_MODE == "local":
+        yield from local_retrieval.stream_answer(user_query)
+        return
+    thread_id = get_thread_id(session_id)
+    if not thread_id:
+        raise RuntimeError("No thread available for this session")
+    with thread_registry.thread_lock(thread_id):
+        yield from stream_run(user_query, thread_id)
+    compact_if_needed(session_id, thread_id)
+
+def compact_if_needed(session_id, thread_id):
+    """Move the session to a summary-seeded thread once this one has grown too large."""
+    thread_compaction.maybe_compact(session_id, thread_id, lambda seed: create_thread(seed_messages=seed))
+
+def stream_run(user_query, thread_id):
+    message_id = create_message(user_query, thread_id)
+    if not message_id or isinstance(message_id, dict):
+        raise RuntimeError("Failed to add message to thread")
+
+    payload = {"assistant_id": ASSISTANT_ID, "stream": True}
+    run = RunEvents(thread_id)
+    try:
+        with openai_client.post(f"/threads/{thread_id}/runs", beta=True, json=payload, stream=True) as response:
+            if response.status_code != 200:
+                raise RuntimeError(f"Failed to start streamed run: {response.text}")
+            for event, data in openai_client.iter_sse_events(response):
+                yield from run.handle(event, data)
+                if run.done:
+                    break
+    finally:
+        # Client disconnected or the run stopped early: cancel it before the
+        # thread lock is released, so the session's next run is not rejected
+        if run.needs_cancel():
+            run_waiter.cancel_and_wait(thread_id, run.run_id)
+
+class RunEvents:
+    """Tracks one streamed run's SSE events; shared by the Flask and ASGI stream_run."""
+
+    def __init__(self, thread_id):
+        self.thread_id = thread_id
+        self.started = time.perf_counter()
+        self.run_id = None
+        self.settled = False  # the run reached a terminal state on its own
+        self.done = False
+
+    def handle(self, event, data):
+        """Return the text deltas carried by one event; raise if the run ended badly."""
+        if event == "thread.run.created":
+            self.run_id = json.loads(data)["id"]
+        elif event == "thread.message.delta":
+            return [part["text"]["value"] for part in json.loads(data)["delta"].get("content", [])
+                    if part.get("type") == "text"]
+        elif event == "thread.run.completed":
+            self.settled = True
+            thread_compaction.record_run(self.thread_id, json.loads(data), time.perf_counter() - self.started)
+        elif event in ("thread.run.failed", "thread.run.cancelled", "thread.run.expired", "thread.run.incomplete"):
+            self.settled = True
+            raise RuntimeError(f"Run ended with {event}")
+        elif event in ("thread.run.requires_action", "error"):
+            raise RuntimeError(f"Run ended with {event}")
+        elif event == "done":
+            self.done = True
+        return []
+
+    def needs_cancel(self):
+        return self.run_id is not None and not self.settled
+
 def save_record_to_csv(username, transcribed_text, filename, timestamp):
     with open(CSV_FILE, mode='a', newline='') as file:
         writer = csv.writer(file)
         writer.writerow([username, transcribed_text, filename, timestamp])
 
-def generate_audio(text, output_path, voice="coral"):
-    """Generate audio using OpenAI's TTS API and save as MP3 using requests."""
-    if text is None or len(text) == 0:
-        text = "Am not clear about the context."
+def synthesize_speech(text, voice="coral"):
+    """Call OpenAI's TTS API and return the MP3 bytes, or None on failure."""
     try:
-        url = "https://api.openai.com/v1/audio/speech"
-
-        headers = {
-            "Authorization": f"Bearer {openai_api_key}",
-            "Content-Type": "application/json"
-        }
         data = {
-            "model": "gpt-4o-mini-tts",  # Correct TTS model
+            "model": TTS_MODEL,  # Correct TTS model
             "input": text,
             "voice": voice,  # Voices: alloy, echo, fable, onyx, nova, shimmer, coral
-            "instructions": "Speak in a cheerful and positive tone."
+            "instructions": TTS_INSTRUCTIONS,
+            "response_format": "mp3"
         }
         # Make POST request
-        response = requests.post(url, headers=headers, data=json.dumps(data))
+        response = openai_client.post("/audio/speech", json=data)
         # Check if the request was successful
         if response.status_code == 200:
-            # Save the audio file as MP3
-            with open(output_path, "wb") as audio_file:
-                audio_file.write(response.content)
-            print(f"✅ Audio successfully generated and saved as {output_path}")
-            return output_path
+            return response.content
         else:
             #print(f"❌ Error generating audio. Status: {response.status_code}, Error: {response.text}")
             return None
@@ -178,22 +490,107 @@ def generate_audio(text, output_path, voice="coral"):
     except Exception as e:
         #print(f"❌ Error during audio generation: {e}")
         return None
+
+def generate_audio(text, voice="coral"):
+    """
+    Return the path of an MP3 of `text`, served from the TTS cache when the same
+    text/voice/model/instructions was synthesized before.
+    """
+    if text is None or len(text) == 0:
+        text = "Am not clear about the context."
+    key = tts_cache.cache_key(text, voice, TTS_MODEL, TTS_INSTRUCTIONS)
+    cached_path = tts_cache.get_path(key)
+    if cached_path:
+        print(f"✅ Audio served from cache: {cached_path}")
+        return cached_path
+    audio_bytes = synthesize_speech(text, voice)
+    if audio_bytes is None:
+        return None
+    output_path = tts_cache.put(key, audio_bytes)
+    print(f"✅ Audio successfully generated and saved as {output_path}")
+    return output_path
+
+def cached_speech_bytes(text, voice="coral"):
+    """Like generate_audio, but returns the MP3 bytes (used for sentence streaming)."""
+    key = tts_cache.cache_key(text, voice, TTS_MODEL, TTS_INSTRUCTIONS)
+    audio_bytes = tts_cache.get_bytes(key)
+    if audio_bytes is None:
+        audio_bytes = synthesize_speech(text, voice)
+        if audio_bytes:
+            tts_cache.put(key, audio_bytes)
+    return audio_bytes
+
+@app.route('/response_stream.mp3', methods=['GET'])
+def stream_audio():
+    """
+    Stream the spoken answer of a voice job sentence by sentence, so playback
+    starts as soon as the first sentence has been synthesized.
+    """
+    job = jobs.get_job(request.args.get("job_id", ""))
+    if job is None or not job.get("output_transcription"):
+        return "❌ Answer not available.", 404
+    text = job["output_transcription"]
+    voice = job.get("voice", "alloy")
+    audio_chunks = tts_stream.stream_speech(text, lambda sentence: cached_speech_bytes(sentence, voice))
+    return Response(
+        stream_with_context(audio_chunks),
+        mimetype="audio/mpeg",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
     
 
+def file_sha256(path, chunk_size=1024 * 1024):
+    """Hex sha256 of a file's contents, read in chunks."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
 def transcribe_audio(audio_path):
+    """Transcribe a clip; concurrent uploads of identical audio share one Whisper call."""
+    try:
+        # The raw upload is hashed: cache hits and coalesced callers skip preprocessing
+        audio_hash = file_sha256(audio_path)
+    except OSError as e:
+        print(f"❌ Error reading audio for transcription: {e}")
+        return None
+    key = (audio_hash, WHISPER_MODEL, WHISPER_LANGUAGE)
+    cached = transcription_cache.get(*key)
+    if cached is not None:
+        print("✅ Transcription served from cache")
+        return cached
+    return transcription_flight.do(key, fetch_and_cache_transcription, audio_path, key)
+
+def fetch_and_cache_transcription(audio_path, key):
+    started = time.perf_counter()
+    # Silence-trimmed 16 kHz mono Opus: a smaller upload and less audio for Whisper
+    audio_path = audio_preprocess.preprocess(audio_path)
+    if audio_path is None:
+        return None
+    text = request_transcription(audio_path)
+    if text:
+        transcription_cache.put(*key, text, time.perf_counter() - started)
+    return text
+
+def request_transcription(audio_path):
     try:
-        url = "https://api.openai.com/v1/audio/transcriptions"
-        headers = {
-            "Authorization": f"Bearer {openai_api_key}",
-        }
-        # Prepare the audio file to be sent
         with open(audio_path, "rb") as audio_file:
-            files = {
-                "file": audio_file,
-                "model": (None, "whisper-1"),
-                "language": (None, "en")  # Change language if needed
-            }
-            response = requests.post(url, headers=headers, files=files)
+            return post_transcription(audio_file, os.path.basename(audio_path))
+    except OSError as e:
+        print(f"❌ Error during audio transcription: {e}")
+        return None
+
+def post_transcription(audio, file_name):
+    """Send a file object or bytes to Whisper; returns the text or None."""
+    try:
+        # Prepare the audio file to be sent
+        files = {
+            "file": (file_name, audio),
+            "model": (None, WHISPER_MODEL),
+            "language": (None, WHISPER_LANGUAGE)  # Change language if needed
+        }
+        response = openai_client.post("/audio/transcriptions", files=files)
         print(response.text)
         if response.status_code == 200:
             transcription_result = json.loads(response.text) 
@@ -211,10 +608,27 @@ def get_audio():
     audio_path = request.args.get("aud_path", None)
     
     if audio_path:
-        audio_file_path = os.path.join(AUDIO_FOLDER, audio_path)
-        print(audio_file_path)
-        if os.path.exists(audio_file_path):
-            return send_file(audio_file_path, mimetype="audio/mp3")
+        # Only files inside AUDIO_FOLDER can be served
+        audio_file_path = audio_store.resolve(audio_path)
+        if audio_file_path:
+            # conditional=True answers Range requests (206) and If-None-Match /
+            # If-Modified-Since (304); whole-file responses go out via wsgi.file_wrapper
+            # (sendfile under gunicorn) or X-Sendfile.
+            immutable = audio_store.is_immutable(audio_file_path)
+            response = send_file(
+                audio_file_path,
+                mimetype=audio_store.mime_type(audio_file_path),
+                conditional=True,
+                etag=audio_store.etag(audio_file_path),
+                max_age=AUDIO_IMMUTABLE_MAX_AGE if immutable else 0,
+            )
+            if immutable:
+                response.cache_control.immutable = True
+                if not audio_store.is_shared(audio_file_path):
+                    # Store files are users' voice recordings: browser cache only
+                    response.cache_control.public = False
+                    response.cache_control.private = True
+            return response
         else:
             return "❌ Audio file not found.", 404
     else:
@@ -223,13 +637,6 @@ def get_audio():
 import time
 
 def create_message(query, thread_id):
-    url = f"https://api.openai.com/v1/threads/{thread_id}/messages"
-
-    headers = {
-        "Content-Type": "application/json",
-        "Authorization": f"Bearer {openai_api_key}",
-        "OpenAI-Beta": "assistants=v2"
-    }
     # Message content to be added
     payload = {
         "role": "user",
@@ -237,7 +644,7 @@ def create_message(query, thread_id):
     }
     try:
         # Send POST request to add the message
-        response = requests.post(url, headers=headers, data=json.dumps(payload))
+        response = openai_client.post(f"/threads/{thread_id}/messages", beta=True, json=payload)
         response_data = response.json()
 
         if response.status_code == 200:
@@ -254,18 +661,12 @@ def create_message(query, thread_id):
 
 
 def run_assistant(thread_id, assistant_id):
-    url = f"https://api.openai.com/v1/threads/{thread_id}/runs"
-    headers = {
-        "Content-Type": "application/json",
-        "Authorization": f"Bearer {openai_api_key}",
-        "OpenAI-Beta": "assistants=v2"
-    }
     payload = {
         "assistant_id": assistant_id
     }
     try:
         # Send POST request to run the assistant
-        response = requests.post(url, headers=headers, data=json.dumps(payload))
+        response = openai_client.post(f"/threads/{thread_id}/runs", beta=True, json=payload)
         response_data = response.json()
 
         if response.status_code == 200:
@@ -279,51 +680,43 @@ def run_assistant(thread_id, assistant_id):
         print(f"⚠️ Error while running assistant: {e}")
         return {"error": str(e)}
     
-def check_run_status(thread_id, run_id):
+def check_run_status(thread_id, run_id, deadline=None):
     """
-    Checks the status of the assistant run until it's completed.
+    Waits (via the shared run waiter) until the assistant run is finished.
+    Returns True only for a completed run; runs past their deadline are cancelled.
     """
-    url = f"https://api.openai.com/v1/threads/{thread_id}/runs/{run_id}"
-    
-    headers = {
-        "Content-Type": "application/json",
-        "Authorization": f"Bearer {openai_api_key}",
-        "OpenAI-Beta": "assistants=v2"
-    }
+    return wait_for_completed_run(thread_id, run_id, deadline) is not None
 
-    while True:
-        response = requests.get(url, headers=headers)
-        response_data = response.json()
+def wait_for_completed_run(thread_id, run_id, deadline=None):
+    """Like check_run_status, but returns the completed run object (with usage) or None."""
+    if not isinstance(run_id, str):
+        return None
+    try:
+        run = run_waiter.wait_for_run(thread_id, run_id, deadline)
+    except run_waiter.RunTimeoutError as e:
+        print(f"❌ {e}")
+        return None
+    except Exception as e:
+        print(f"⚠️ Failed to check run status. Error: {e}")
+        return None
 
-        if response.status_code == 200:
-            status = response_data["status"]
-            print(f"⏳ Run Status: {status}")
-
-            if status == "completed":
-                print("✅ Run completed successfully!")
-                return True
-            elif status in ["failed", "cancelled"]:
-                print(f"❌ Run failed or was cancelled. Status: {status}")
-                return False
-            else:
-                time.sleep(2)  # Wait and check again
-        else:
-            print(f"⚠️ Failed to check run status. Error: {response_data}")
-            return False
+    status = run.get("status")
+    if status == "completed":
+        print("✅ Run completed successfully!")
+        return run
+    print(f"❌ Run did not complete. Status: {status}")
+    return None
         
-def get_all_messages_from_thread(thread_id):
+def get_all_messages_from_thread(thread_id, run_id=None):
     """
-    Retrieves all messages from the thread after run completion.
+    Retrieves the assistant's reply from the thread after run completion.
+    With run_id, only messages produced by that run are considered, so
+    concurrent runs never read each other's answers.
     """
-    url = f"https://api.openai.com/v1/threads/{thread_id}/messages?limit=3&order=desc"
-    
-    headers = {
-        "Content-Type": "application/json",
-        "Authorization": f"Bearer {openai_api_key}",
-        "OpenAI-Beta": "assistants=v2"
-    }
-
-    response = requests.get(url, headers=headers)
+    params = {"limit": 3, "order": "desc"}
+    if run_id:
+        params["run_id"] = run_id
+    response = openai_client.get(f"/threads/{thread_id}/messages", beta=True, params=params)
     response_data = response.json()
 
     if response.status_code == 200:
@@ -352,15 +745,9 @@ def get_all_messages_from_thread(thread_id):
 def get_message_from_thread(openai_api_key, thread_id, message_id):
 
     #url = f"https://api.openai.com/v1/threads/{thread_id}/messages/{message_id}"
-    url = f"https://api.openai.com/v1/threads/{thread_id}/messages"
-    headers = {
-        "Content-Type": "application/json",
-        "Authorization": f"Bearer {openai_api_key}",
-        "OpenAI-Beta": "assistants=v2"
-    }
     try: 
         # Send GET request to retrieve the message
-        response = requests.get(url, headers=headers)
+        response = openai_client.get(f"/threads/{thread_id}/messages", beta=True)
         response_data = response.json()
 
         if response.status_code == 200:
@@ -390,41 +777,35 @@ def get_message_from_thread(openai_api_key, thread_id, message_id):
      #   return f"⚠ Error contacting OpenAI: {e}"
 
 #---Create assistant
-def update_thread_id(thread_id):
-    thread_data = {"thread_id": thread_id}
-    with open(THREAD_FILE, "w") as f:
-        json.dump(thread_data, f, indent=4)
-    print(f"✅ Thread ID updated in thread.json: {thread_id}")
-
-def create_thread(user_qry):
-    url = "https://api.openai.com/v1/threads"
-    headers = {
-        "Content-Type": "application/json",
-        "Authorization": f"Bearer {openai_api_key}",
-        "OpenAI-Beta": "assistants=v2"
-    }
-    initial_message = {
-        "role": "user",
-        "content": user_qry
-    }
+def create_thread(user_qry=None, seed_messages=None):
+    """
+    Create a thread attached to the vector store and return its ID (callers bind it to a session).
+    seed_messages (e.g. a compacted summary of an older thread) are added before user_qry.
+    """
     tool_resources = {
         "file_search": {
             "vector_store_ids": [VSTORE_ID]
         }
     }
     payload = {
-        "messages": [initial_message],
         "tool_resources": tool_resources
     }
+    messages = list(seed_messages or [])
+    if user_qry:
+        messages.append({
+            "role": "user",
+            "content": user_qry
+        })
+    if messages:
+        payload["messages"] = messages
 
     try:
         # Sending an empty payload to create a thread
-        response = requests.post(url, headers=headers, data=json.dumps(payload))
+        response = openai_client.post("/threads", beta=True, json=payload)
         response_data = response.json()
         if response.status_code == 200:
             thread_id = response_data.get("id")
             print(f"✅ Thread created successfully. Thread ID: {thread_id}")
-            update_thread_id(thread_id)
             return thread_id
         else:
             print(f"❌ Failed to create thread. Error: {response_data}")
@@ -432,20 +813,11 @@ def create_thread(user_qry):
 
     except Exception as e:
         print(f"⚠️ Error: {e}")
-        return {"error": str(e)}
+        return None
 
 
 
 def create_assistant():
-   
-    url = "https://api.openai.com/v1/assistants"
-    
-    headers = {
-        "Authorization": f"Bearer {openai_api_key}",
-        "Content-Type": "application/json",
-        "OpenAI-Beta": "assistants=v2"
-    }
-
     assistant_data = {
         "name": "Boardroom Research Assistant",
         "instructions": (
@@ -464,7 +836,7 @@ def create_assistant():
     }
 
     # Send POST request to create the assistant
-    response = requests.post(url, headers=headers, json=assistant_data)
+    response = openai_client.post("/assistants", beta=True, json=assistant_data)
     response_json = response.json()
 
     if response.status_code == 200:
@@ -476,104 +848,195 @@ def create_assistant():
         return None
     
 
+def upload_to_openai(file, claimed):
+    """
+    Stream one incoming file to OpenAI, writing the local copy and hashing it
+    in the same pass; returns a per-file result dict. Content already in the
+    knowledge base, or being ingested by another upload, is not uploaded again:
+    it becomes an alias of that file. Hashes this call took ownership of are
+    appended to `claimed`; the caller releases them with release_ingest().
+    """
+    result = {"file_name": file.filename, "file_id": None, "sha256": None, "status": "failed", "message": ""}
+    local_path = os.path.join(UPLOAD_FOLDER, file.filename)
+    try:
+        sha256 = upload_stream.hash_stream(file.stream)
+        with pending_ingest_lock:
+            pending = pending_ingest.get(sha256)
+            existing = file_registry.get_by_hash(sha256) if pending is None else None
+            if pending is None and existing is None:
+                pending = pending_ingest[sha256] = Future()
+                claimed.append(sha256)
+                leader = True
+            else:
+                leader = False
+        if existing:
+            file.save(local_path)
+            result.update(file_id=existing["file_id"], sha256=sha256, status="duplicate",
+                          message=f"Same content as {existing['file_name']}")
+            return result
+        if leader:
+            try:
+                uploaded = upload_stream.upload_stream(file.stream, file.filename, local_path, file.mimetype)
+            except Exception as e:
+                pending.set_exception(e)
+                raise
+            pending.set_result(uploaded["file_id"])
+            file_id = uploaded["file_id"]
+        else:
+            # Identical content uploaded just now (or still uploading): share its file
+            file_id = pending.result()
+            file.save(local_path)
+        result.update(file_id=file_id, sha256=sha256, status="uploaded")
+    except Exception as e:
+        result["message"] = f"Failed to upload file to OpenAI: {e}"
+    return result
+
+def release_ingest(claimed):
+    """Drop the pending claims once their files are registered (or the upload gave up)."""
+    with pending_ingest_lock:
+        for sha256 in claimed:
+            pending_ingest.pop(sha256, None)
+
+def attach_files_to_vector_store(file_ids):
+    """Attach all uploaded files to the vector store in one file-batch call."""
+    response = openai_client.post(
+        f"/vector_stores/{VSTORE_ID}/file_batches", beta=True, json={"file_ids": file_ids}
+    )
+    if response.status_code == 200:
+        print(f"✅ Linked {len(file_ids)} file(s) to KE in batch {response.json().get('id')}")
+        return True
+    print(f"❌ Failed to link files to KE. Error: {response.text}")
+    return False
+
+def link_and_register(results, claimed):
+    """
+    Attach the newly uploaded files to the vector store and register every name.
+    Returns an error payload, or None once all uploaded/duplicate files are registered.
+    """
+    uploaded = [result for result in results if result["status"] == "uploaded"]
+    duplicates = [result for result in results if result["status"] == "duplicate"]
+    if not uploaded and not duplicates:
+        return {"status": "error", "message": "Failed to upload file(s) to OpenAI.", "files": results}
+
+    # --- Link Files to Vector Store ---
+    if uploaded:
+        new_file_ids = list(dict.fromkeys(result["file_id"] for result in uploaded))
+        if not attach_files_to_vector_store(new_file_ids):
+            # Only delete files this request uploaded; shared ones belong to another request
+            for file_id in {result["file_id"] for result in uploaded if result["sha256"] in claimed}:
+                delete_from_openai(file_id)
+            for result in uploaded:
+                result.update(status="failed", message="Failed to link file to KE.")
+            return {"status": "failure", "message": "⚠️ Failed to link file(s) to KE.", "files": results}
+
+    for result in uploaded + duplicates:
+        file_registry.add_file(result["file_name"], result["file_id"], result["sha256"])
+    for result in uploaded:
+        result["status"] = "linked"
+    return None
+
+def finish_upload(results, claimed):
+    """
+    Link and register the upload results, then do the knowledge-base bookkeeping
+    (ingestion tracking, local indexing, cache/thread invalidation). Returns the
+    response payload; shared by the Flask and ASGI /upload_file routes.
+    """
+    error = link_and_register(results, claimed)
+    if error is not None:
+        return error
+    uploaded = [result for result in results if result["status"] == "linked"]
+    duplicates = [result for result in results if result["status"] == "duplicate"]
+    for result in {result["file_id"]: result for result in uploaded}.values():
+        ingestion_tracker.track(result["file_id"], result["file_name"], VSTORE_ID)
+        if ANSWER_MODE == "local":
+            upload_executor.submit(index_locally, result["file_id"], result["file_name"])
+    if uploaded:
+        answer_cache.bump_version()
+        # Sessions start fresh threads lazily on their next query
+        thread_registry.reset()
+
+    failed = len(results) - len(uploaded) - len(duplicates)
+    if failed:
+        return {"status": "partial", "message": f"⚠️ {len(uploaded) + len(duplicates)} file(s) linked, {failed} failed.", "files": results}
+    return {"status": "success", "message": "📚 Files uploaded and linked to KE successfully!", "files": results}
+
 @app.route('/upload_file', methods=['POST'])
 def process_upload():
+    """
+    Stream every selected file to OpenAI concurrently, then attach them to
+    the vector store with a single file batch. Reports per-file results.
+    """
     try:
         if "file" not in request.files:
             return jsonify({"status": "error", "message": "No file part"})
-        files = request.files.getlist("file")
+        files = [file for file in request.files.getlist("file") if file.filename]
+        if not files:
+            return jsonify({"status": "error", "message": "No selected file"})
 
-        for file in files:
-            if file.filename == "":
-                return jsonify({"status": "error", "message": "No selected file"})
-            file_path = os.path.join(UPLOAD_FOLDER,  file.filename)
-            file.save(os.path.join(UPLOAD_FOLDER, file.filename))
-        
-     
-            # --- Upload File to OpenAI ---
-            upload_url = "https://api.openai.com/v1/files"
-            headers = {
-                "Authorization": f"Bearer {openai_api_key}"
-            }
-            with open(file_path, "rb") as file_to_upload:
-                files = {
-                    "file": (os.path.basename(file_path), open(file_path, "rb")),
-                    "purpose": (None, "assistants")
-                }
-                upload_response = requests.post(upload_url, headers=headers, files=files)
-            upload_response_json = upload_response.json()
-
-            if upload_response.status_code != 200:
-                return jsonify({"status": "error", "message": f"Failed to upload file to OpenAI: {upload_response_json.get('error', 'Unknown error')}"})
-            
-            file_id = upload_response_json.get("id")
-            save_to_csv( file.filename, file_id)
-            #time.sleep(2)
-            # --- Link File to Vector Store ---
-            link_url = f"https://api.openai.com/v1/vector_stores/{VSTORE_ID}/files"
-            link_data = {"file_id": file_id}
-            link_headers = {
-                "Authorization": f"Bearer {openai_api_key}",
-                "Content-Type": "application/json",
-                "OpenAI-Beta": "assistants=v2"
-            }
-
-            link_response = requests.post(link_url, headers=link_headers, json=link_data)
-            link_response_json = link_response.json()
-            if link_response.status_code == 200 :
-                create_thread("Hi")
-                return jsonify({"status": "success", "message": "📚 Files uploaded and linked to KE successfully!"})
-            else:
-                return jsonify({"status": "failure", "message": "⚠️ Failed to link file to KE."})
+        # --- Upload Files to OpenAI (bounded pool, so total time ~ slowest file) ---
+        claimed = []
+        try:
+            results = list(upload_executor.map(lambda file: upload_to_openai(file, claimed), files))
+            return jsonify(finish_upload(results, claimed))
+        finally:
+            release_ingest(claimed)
 
     except Exception as e:
-        return None
+        print(f"❌ Error during upload: {e}")
+        return jsonify({"status": "error", "message": str(e)}), 500
 
 
 @app.route("/delete_file/<file_id>", methods=["DELETE"])
 def delete_file(file_id):
-    """Delete a file using its file ID."""
+    """
+    Delete one file name (alias). The OpenAI file is only removed when its
+    last alias goes, since deduplicated uploads share content.
+    """
     if not file_id:
         return jsonify({"error": "File ID is required."}), 400
 
-    document_context = load_uploaded_files()
-    file_name_to_delete = None
-
-    # ✅ Find the file name by its file_id
-    for item in document_context:
-        if item["file_id"] == file_id:
-            file_name_to_delete = item["file_name"]
-            break
+    # ✅ Find the alias by its ID, falling back to the first name for file_id
+    alias_id = request.args.get("alias_id", type=int)
+    record = file_registry.get_alias(alias_id) if alias_id else file_registry.get_by_file_id(file_id)
 
     # ✅ If file not found
-    if not file_name_to_delete:
+    if not record or record["file_id"] != file_id:
         return jsonify({"status":False, "message": "File not found in document context."}), 404
+    file_name_to_delete = record["file_name"]
+
+    remaining = file_registry.delete_alias(record["id"])
+    if remaining is None:
+        return jsonify({"status":False, "message": "File not found in document context."}), 404
+    if remaining:
+        return jsonify({"status":True, "message": f"❌ Deleted file: {file_name_to_delete}"})
 
-    # ✅ Try to delete file from OpenAI
+    # ✅ Last alias gone: try to delete file from OpenAI
     if delete_from_openai(file_id):
-        update_csv_after_delete(file_name_to_delete)
-        create_thread("Hi")
+        ingestion_tracker.forget(file_id)
+        if ANSWER_MODE == "local":
+            local_retrieval.get_index().remove_document(file_id)
+        answer_cache.bump_version()
+        thread_registry.reset()
         return jsonify({"status":True, "message": f"❌ Deleted file: {file_name_to_delete}"})
 
+    # Put the name back so the registry still reflects what is in the KE
+    file_registry.add_file(record["file_name"], file_id, record["content_hash"])
     return jsonify({"status":False, "message": "⚠️ Unable to delete file from OpenAI. Please try again."}), 500
     
 
-def update_csv_after_delete(file_name_to_delete):
-    """Update CSV after file deletion."""
-    df = pd.read_csv(CSV_FILE)
-    df = df[df["file_name"] != file_name_to_delete]
-    df.to_csv(CSV_FILE, index=False)
+def index_locally(file_id, file_name):
+    """Add an uploaded document to the local retrieval index (runs off the request thread)."""
+    try:
+        local_retrieval.get_index().add_document(file_id, file_name, os.path.join(UPLOAD_FOLDER, file_name))
+        answer_cache.bump_version()
+    except Exception as e:
+        print(f"⚠️ Could not index {file_name} locally: {e}")
 
 def delete_from_openai(file_id):
     """Delete a file from OpenAI vector store using file_id."""
     try:
         #st.info(f"⏳ Deleting file from OpenAI: {file_id}")
-        delete_url = f"https://api.openai.com/v1/files/{file_id}"
-        headers = {
-            "Authorization": f"Bearer {openai_api_key}"
-        }
-        #st.info(delete_url)
-        response = requests.delete(delete_url, headers=headers)
+        response = openai_client.delete(f"/files/{file_id}")
         if response.status_code == 200:
             print(f"✅ File successfully reemoved from KE.")
             return True
@@ -584,30 +1047,60 @@ def delete_from_openai(file_id):
         print(f"❌ Error removing file from KE: {str(e)}")
         return False
 
-def save_to_csv(file_name, file_id):
-    file_exists = os.path.isfile(CSV_FILE)
-    with open(CSV_FILE, mode="a", newline="") as csv_file:
-        csv_writer = csv.writer(csv_file)
-        if not file_exists:
-            writer.writerow(["file_name", "file_id","modified"])
-        csv_writer.writerow([file_name, file_id, time.strftime("%Y-%m-%d %H:%M:%S")])
-
-    print(f"✅ File info saved to CSV: {file_name} | File ID: {file_id}")
-
-
-def check_file_status(file_id):
-    for _ in range(10):  # Check status for 10 seconds
-        file_info = openai.File.retrieve(file_id)
-        status = file_info["status"]
-        print(f"⏳ File status: {status}")
-
-        if status == "processed":
-            print("✅ File processed and ready!")
-            return True
-        time.sleep(1)
-    print("❌ File not processed in time. Try again.")
-    return False
-
+# ---------- Live voice over websockets ----------
+
+@socketio.on("voice_start")
+def live_voice_start():
+    """Begin a streamed utterance; the client then sends 16 kHz int16 PCM as audio_chunk events."""
+    sid = request.sid
+    session_id = request.cookies.get(SESSION_COOKIE)
+    live_sessions[sid] = live_voice.LiveSession(
+        transcribe=lambda wav: post_transcription(wav, "speech.wav"),
+        on_partial=lambda text: socketio.emit("partial_transcript", {"text": text}, to=sid),
+        on_final=lambda text: answer_live_voice(sid, session_id, text),
+    )
+
+@socketio.on("audio_chunk")
+def live_voice_chunk(data):
+    session = live_sessions.get(request.sid)
+    if session is not None and isinstance(data, (bytes, bytearray)):
+        if not session.feed(bytes(data)):
+            socketio.emit("speech_ended", {}, to=request.sid)
+
+@socketio.on("voice_stop")
+def live_voice_stop():
+    session = live_sessions.get(request.sid)
+    if session is not None:
+        session.finish()
+
+@socketio.on("disconnect")
+def live_voice_disconnect():
+    live_sessions.pop(request.sid, None)
+
+def answer_live_voice(sid, session_id, text):
+    """Final transcript in: queue the answer on the job pool and hand the client the job."""
+    live_sessions.pop(sid, None)
+    if not text:
+        socketio.emit("voice_error", {"message": "No speech detected."}, to=sid)
+        return
+    socketio.emit("final_transcript", {"text": text}, to=sid)
+    try:
+        jobs.submit_job(process_live_voice_job, sid, session_id, voice="alloy", input_transcription=text)
+    except jobs.QueueFullError:
+        socketio.emit("voice_error", {"message": "Server busy, please try again shortly."}, to=sid)
+
+def process_live_voice_job(job_id, sid, session_id=None):
+    """Worker body for a live utterance: answer it, then let /response_stream.mp3 speak it."""
+    jobs.update_job(job_id, status="answering")
+    text = jobs.get_job(job_id)["input_transcription"]
+    try:
+        openai_response = get_openai_reply(text, session_id)
+    except Exception:
+        socketio.emit("voice_error", {"message": "Error answering the question."}, to=sid)
+        raise
+    jobs.update_job(job_id, stage="answer", status="completed", output_transcription=str(openai_response),
+                    stream_url=f"/response_stream.mp3?job_id={job_id}")
+    socketio.emit("voice_answer", jobs.get_job(job_id), to=sid)
 
 if __name__ == '__main__':
-    app.run(host="0.0.0.0", port=8501, debug=True)
+    socketio.run(app, host="0.0.0.0", port=8501, debug=True)
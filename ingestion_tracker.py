@@ -0,0 +1,167 @@
+import os
+import queue
+import threading
+import time
+from collections import deque
+
+import openai_client
+
+# Background tracker for vector-store file processing. Files attached to the
+# vector store are "in_progress" until OpenAI has chunked and embedded them.
+# A single daemon thread polls every pending file in one loop (one list call
+# per tick, backing off while nothing changes) and pushes status changes to
+# subscribers, e.g. the SSE stream feeding the file table.
+
+POLL_MIN_INTERVAL = float(os.getenv("INGEST_POLL_MIN_INTERVAL", "1"))
+POLL_MAX_INTERVAL = float(os.getenv("INGEST_POLL_MAX_INTERVAL", "15"))
+POLL_BACKOFF = 1.5
+GIVE_UP_AFTER = float(os.getenv("INGEST_GIVE_UP_AFTER", "1800"))
+
+_lock = threading.Lock()
+_wakeup = threading.Event()
+_pending = {}    # file_id -> {"file_name", "vector_store_id", "started_at"}
+_statuses = {}   # file_id -> last known status
+_durations = deque(maxlen=1000)  # seconds from attach to completed (most recent)
+_subscribers = set()
+_worker = None
+
+
+def track(file_id, file_name, vector_store_id):
+    """Start watching a file that was just attached to the vector store."""
+    global _worker
+    with _lock:
+        _pending[file_id] = {"file_name": file_name, "vector_store_id": vector_store_id, "started_at": time.time()}
+        _statuses[file_id] = "in_progress"
+        if _worker is None or not _worker.is_alive():
+            _worker = threading.Thread(target=_run, name="ingestion-tracker", daemon=True)
+            _worker.start()
+    _publish({"file_id": file_id, "file_name": file_name, "status": "in_progress"})
+    _wakeup.set()
+
+
+def forget(file_id):
+    """Stop reporting a file (e.g. after it was deleted)."""
+    with _lock:
+        _pending.pop(file_id, None)
+        _statuses.pop(file_id, None)
+
+
+def get_status(file_id):
+    with _lock:
+        return _statuses.get(file_id)
+
+
+def subscribe():
+    """Return a queue that receives every status-change event."""
+    q = queue.Queue(maxsize=100)
+    with _lock:
+        _subscribers.add(q)
+    return q
+
+
+def unsubscribe(q):
+    with _lock:
+        _subscribers.discard(q)
+
+
+def _publish(event):
+    with _lock:
+        subscribers = list(_subscribers)
+    for q in subscribers:
+        try:
+            q.put_nowait(event)
+        except queue.Full:
+            pass  # slow consumer; it will resync from /list_all_file
+
+
+def _in_progress_ids(vector_store_id):
+    """IDs of every file the vector store is still processing (one paginated list call)."""
+    ids, after = set(), None
+    while True:
+        params = {"filter": "in_progress", "limit": 100}
+        if after:
+            params["after"] = after
+        response = openai_client.get(f"/vector_stores/{vector_store_id}/files", beta=True, params=params)
+        if response.status_code != 200:
+            raise RuntimeError(f"Failed to list vector store files: {response.text}")
+        data = response.json()
+        ids.update(item["id"] for item in data.get("data", []))
+        if not data.get("has_more"):
+            return ids
+        after = data.get("last_id")
+
+
+def _final_status(vector_store_id, file_id):
+    response = openai_client.get(f"/vector_stores/{vector_store_id}/files/{file_id}", beta=True)
+    if response.status_code == 404:
+        return "failed"
+    if response.status_code != 200:
+        return None
+    return response.json().get("status")
+
+
+def _poll_once():
+    """Poll all pending files; returns True if any status changed."""
+    with _lock:
+        pending = dict(_pending)
+    if not pending:
+        return False
+
+    changed = False
+    by_store = {}
+    for file_id, info in pending.items():
+        by_store.setdefault(info["vector_store_id"], []).append(file_id)
+
+    for vector_store_id, file_ids in by_store.items():
+        still_running = _in_progress_ids(vector_store_id)
+        for file_id in file_ids:
+            info = pending[file_id]
+            elapsed = time.time() - info["started_at"]
+            if file_id in still_running:
+                status = "timeout" if elapsed > GIVE_UP_AFTER else None
+            else:
+                status = _final_status(vector_store_id, file_id)
+            if status is None or status == "in_progress":
+                continue
+
+            with _lock:
+                if file_id not in _pending:
+                    continue  # forgotten meanwhile
+                del _pending[file_id]
+                _statuses[file_id] = status
+                if status == "completed":
+                    _durations.append(elapsed)
+            print(f"✅ File {info['file_name']} ingestion {status} after {elapsed:.1f}s")
+            _publish({
+                "file_id": file_id,
+                "file_name": info["file_name"],
+                "status": status,
+                "ingest_seconds": round(elapsed, 2),
+            })
+            changed = True
+    return changed
+
+
+def _run():
+    interval = POLL_MIN_INTERVAL
+    while True:
+        woke = _wakeup.wait(timeout=interval)
+        _wakeup.clear()
+        try:
+            changed = _poll_once()
+        except Exception as e:
+            print(f"⚠️ Ingestion tracker poll failed: {e}")
+            changed = False
+        # New work or progress: poll quickly again; otherwise back off.
+        interval = POLL_MIN_INTERVAL if (woke or changed) else min(interval * POLL_BACKOFF, POLL_MAX_INTERVAL)
+
+
+def get_stats():
+    with _lock:
+        durations = list(_durations)
+        return {
+            "pending": len(_pending),
+            "completed": len(durations),
+            "avg_ingest_seconds": round(sum(durations) / len(durations), 2) if durations else 0.0,
+            "max_ingest_seconds": round(max(durations), 2) if durations else 0.0,
+        }
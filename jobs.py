@@ -0,0 +1,110 @@
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+# Bounded background worker pool for long-running request work (voice turns).
+# Handlers enqueue a job and return its ID immediately; the worker updates the
+# job record stage by stage and clients poll get_job() for progress.
+
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "4"))
+JOB_QUEUE_LIMIT = int(os.getenv("JOB_QUEUE_LIMIT", "64"))
+JOB_TTL_SECONDS = int(os.getenv("JOB_TTL_SECONDS", "3600"))
+
+FINISHED_STATES = ("completed", "failed")
+
+_executor = ThreadPoolExecutor(max_workers=JOB_WORKERS, thread_name_prefix="job-worker")
+_jobs = {}
+_lock = threading.Lock()
+
+
+class QueueFullError(Exception):
+    """Raised when too many jobs are already waiting for a worker."""
+
+
+def _prune():
+    """Drop finished jobs older than JOB_TTL_SECONDS. Caller holds _lock."""
+    cutoff = time.time() - JOB_TTL_SECONDS
+    expired = [
+        job_id for job_id, job in _jobs.items()
+        if job["status"] in FINISHED_STATES and job["updated_at"] < cutoff
+    ]
+    for job_id in expired:
+        del _jobs[job_id]
+
+
+def _run(job_id, fn, args):
+    try:
+        fn(job_id, *args)
+    except Exception as e:
+        print(f"❌ Job {job_id} failed: {e}")
+        update_job(job_id, status="failed", error=str(e))
+    else:
+        if get_job(job_id)["status"] not in FINISHED_STATES:
+            update_job(job_id, status="completed")
+
+
+def create_job(**fields):
+    """
+    Register a queued job record and return its ID, without running anything
+    (the ASGI app drives its jobs as coroutines). Raises QueueFullError when
+    JOB_QUEUE_LIMIT unfinished jobs already exist.
+    """
+    job_id = uuid.uuid4().hex
+    now = time.time()
+    with _lock:
+        _prune()
+        pending = sum(1 for job in _jobs.values() if job["status"] not in FINISHED_STATES)
+        if pending >= JOB_QUEUE_LIMIT:
+            raise QueueFullError(f"{pending} jobs already pending")
+        _jobs[job_id] = dict(fields, job_id=job_id, status="queued", error=None,
+                             created_at=now, updated_at=now, stages={})
+    return job_id
+
+
+def submit_job(fn, *args, **fields):
+    """
+    Queue fn(job_id, *args) on the worker pool and return the new job ID.
+
+    Extra keyword fields are stored on the job record. Raises QueueFullError
+    when JOB_QUEUE_LIMIT unfinished jobs already exist.
+    """
+    job_id = create_job(**fields)
+    _executor.submit(_run, job_id, fn, args)
+    return job_id
+
+
+def update_job(job_id, stage=None, **fields):
+    """
+    Update a job record. When `stage` is given its duration since the last
+    update is recorded under job["stages"][stage] (seconds).
+    """
+    now = time.time()
+    with _lock:
+        job = _jobs.get(job_id)
+        if job is None:
+            return
+        if stage:
+            job["stages"][stage] = round(now - job["updated_at"], 3)
+        job.update(fields)
+        job["updated_at"] = now
+
+
+def get_job(job_id):
+    """Return a snapshot of the job record, or None if unknown/expired."""
+    with _lock:
+        job = _jobs.get(job_id)
+        if job is None:
+            return None
+        snapshot = dict(job)
+        snapshot["stages"] = dict(job["stages"])
+        return snapshot
+
+
+def get_stats():
+    with _lock:
+        counts = {}
+        for job in _jobs.values():
+            counts[job["status"]] = counts.get(job["status"], 0) + 1
+        return {"workers": JOB_WORKERS, "queue_limit": JOB_QUEUE_LIMIT, "jobs": counts}
@@ -0,0 +1,213 @@
+import io
+import math
+import os
+import re
+import threading
+import time
+import wave
+from array import array
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+# Live voice input. The browser streams 16-bit mono PCM over the websocket
+# while the user is still speaking. Audio is cut into overlapping windows that
+# are transcribed as soon as each one is complete, partial transcripts are
+# pushed back as they land, and an energy-based VAD detects end of speech so
+# the final transcript (and the assistant query) starts without waiting for
+# the user to press stop.
+
+LIVE_SAMPLE_RATE = 16000
+LIVE_SEGMENT_SECONDS = float(os.getenv("LIVE_SEGMENT_SECONDS", "4"))
+LIVE_OVERLAP_SECONDS = float(os.getenv("LIVE_OVERLAP_SECONDS", "1"))
+LIVE_END_SILENCE_MS = int(os.getenv("LIVE_END_SILENCE_MS", "700"))
+LIVE_VAD_THRESHOLD_DB = float(os.getenv("LIVE_VAD_THRESHOLD_DB", "-42"))
+LIVE_MAX_SECONDS = float(os.getenv("LIVE_MAX_SECONDS", "60"))
+LIVE_TRANSCRIBE_WORKERS = int(os.getenv("LIVE_TRANSCRIBE_WORKERS", "8"))
+VAD_FRAME_MS = 20
+MIN_SPEECH_MS = 120      # voiced audio needed before we consider the user to be talking
+PRE_ROLL_MS = 300        # audio kept before the first voiced frame
+MAX_OVERLAP_WORDS = 8
+
+_executor = ThreadPoolExecutor(max_workers=LIVE_TRANSCRIBE_WORKERS, thread_name_prefix="live-stt")
+_stats_lock = threading.Lock()
+_stats = {"utterances": 0, "segments": 0}
+_final_delays = deque(maxlen=1000)  # seconds from end of speech to final transcript
+_WORD = re.compile(r"[^\w']+")
+
+
+def frame_dbfs(samples):
+    """RMS level of a frame of int16 samples, in dBFS (-inf for digital silence)."""
+    if not samples:
+        return -math.inf
+    rms = math.sqrt(sum(s * s for s in samples) / len(samples))
+    return 20 * math.log10(rms / 32768) if rms else -math.inf
+
+
+def pcm_to_wav(pcm, sample_rate=LIVE_SAMPLE_RATE):
+    """Wrap raw 16-bit mono PCM in a WAV container for the transcription API."""
+    buffer = io.BytesIO()
+    with wave.open(buffer, "wb") as wav:
+        wav.setnchannels(1)
+        wav.setsampwidth(2)
+        wav.setframerate(sample_rate)
+        wav.writeframes(pcm)
+    return buffer.getvalue()
+
+
+def _normalize_word(word):
+    return _WORD.sub("", word.lower())
+
+
+def merge_overlap(text, addition):
+    """
+    Append `addition` to `text`, dropping the words the two share because the
+    audio windows overlapped (longest suffix/prefix match, up to MAX_OVERLAP_WORDS).
+    """
+    left, right = text.split(), addition.split()
+    if not left:
+        return " ".join(right)
+    left_norm = [_normalize_word(w) for w in left[-MAX_OVERLAP_WORDS:]]
+    right_norm = [_normalize_word(w) for w in right[:MAX_OVERLAP_WORDS]]
+    for size in range(min(len(left_norm), len(right_norm)), 0, -1):
+        if left_norm[-size:] == right_norm[:size]:
+            right = right[size:]
+            break
+    return " ".join(left + right)
+
+
+class LiveSession:
+    """
+    One utterance being streamed in.
+
+    transcribe(wav_bytes) -> text runs on the shared pool; on_partial(text) is
+    called whenever the transcript grows; on_final(text) is called once, when
+    the VAD hears the end of speech or finish() is called.
+    """
+
+    def __init__(self, transcribe, on_partial, on_final, sample_rate=LIVE_SAMPLE_RATE):
+        self.transcribe = transcribe
+        self.on_partial = on_partial
+        self.on_final = on_final
+        self.sample_rate = sample_rate
+        self.started_at = time.time()
+        self._lock = threading.Lock()
+        self._pcm = array("h")
+        self._vad_pos = 0            # samples already run through the VAD
+        self._speech_start = None    # sample index where speech began
+        self._voiced_ms = 0
+        self._silence_ms = 0
+        self._cut = None             # end of the last window handed to the pool
+        self._segments = []          # [Future] in audio order
+        self._finished = False
+        self.speech_ended_at = None
+
+    @property
+    def _frame(self):
+        return self.sample_rate * VAD_FRAME_MS // 1000
+
+    def feed(self, chunk):
+        """Add a chunk of little-endian int16 PCM. Returns False once the utterance is over."""
+        with self._lock:
+            if self._finished:
+                return False
+            samples = array("h")
+            samples.frombytes(chunk[:len(chunk) - len(chunk) % 2])
+            self._pcm.extend(samples)
+            ended = self._run_vad()
+            if self._speech_start is not None:
+                window = int(LIVE_SEGMENT_SECONDS * self.sample_rate)
+                while len(self._pcm) - self._cut >= window:
+                    self._submit(self._cut + window)
+            too_long = len(self._pcm) >= LIVE_MAX_SECONDS * self.sample_rate
+        if ended or too_long:
+            self.finish()
+            return False
+        return True
+
+    def _run_vad(self):
+        """Advance the VAD over new frames; returns True when speech has ended. Caller holds _lock."""
+        frame = self._frame
+        while self._vad_pos + frame <= len(self._pcm):
+            voiced = frame_dbfs(self._pcm[self._vad_pos:self._vad_pos + frame]) > LIVE_VAD_THRESHOLD_DB
+            self._vad_pos += frame
+            if self._speech_start is None:
+                self._voiced_ms = self._voiced_ms + VAD_FRAME_MS if voiced else 0
+                if self._voiced_ms >= MIN_SPEECH_MS:
+                    onset = self._vad_pos - self._voiced_ms * self.sample_rate // 1000
+                    self._speech_start = max(0, onset - PRE_ROLL_MS * self.sample_rate // 1000)
+                    self._cut = self._speech_start
+                continue
+            self._silence_ms = 0 if voiced else self._silence_ms + VAD_FRAME_MS
+            if self._silence_ms >= LIVE_END_SILENCE_MS:
+                self.speech_ended_at = time.time()
+                return True
+        return False
+
+    def _submit(self, end):
+        """Hand the window [cut - overlap, end) to the pool. Caller holds _lock."""
+        overlap = int(LIVE_OVERLAP_SECONDS * self.sample_rate)
+        start = max(self._speech_start, self._cut - overlap) if self._segments else self._cut
+        wav = pcm_to_wav(self._pcm[start:end].tobytes(), self.sample_rate)
+        future = _executor.submit(self.transcribe, wav)
+        future.add_done_callback(lambda _: self._publish_partial())
+        self._segments.append(future)
+        self._cut = end
+        with _stats_lock:
+            _stats["segments"] += 1
+
+    def _merged(self, wait=False):
+        text = ""
+        for future in list(self._segments):
+            if not wait and not future.done():
+                break
+            try:
+                piece = future.result() or ""
+            except Exception as e:
+                print(f"⚠️ Live segment transcription failed: {e}")
+                piece = ""
+            text = merge_overlap(text, piece)
+        return text
+
+    def _publish_partial(self):
+        if self._finished:
+            return
+        text = self._merged()
+        if text:
+            self.on_partial(text)
+
+    def finish(self):
+        """End the utterance: transcribe what is left, then deliver the final transcript off-thread."""
+        with self._lock:
+            if self._finished:
+                return
+            self._finished = True
+            if self.speech_ended_at is None:
+                self.speech_ended_at = time.time()
+            if self._speech_start is not None and len(self._pcm) > self._cut:
+                # Trailing silence is not worth sending
+                end = min(len(self._pcm), self._vad_pos - self._silence_ms * self.sample_rate // 1000 + self._frame)
+                if end > self._cut:
+                    self._submit(end)
+        # Not on the STT pool: this waits for the segment results; on_final should hand
+        # any heavy work (the assistant query) to a bounded pool of its own
+        threading.Thread(target=self._deliver_final, name="live-final", daemon=True).start()
+
+    def _deliver_final(self):
+        text = self._merged(wait=True)
+        with _stats_lock:
+            _stats["utterances"] += 1
+            _final_delays.append(time.time() - self.speech_ended_at)
+        try:
+            self.on_final(text)
+        except Exception as e:
+            print(f"❌ Live voice turn failed: {e}")
+
+
+def get_stats():
+    with _stats_lock:
+        delays = list(_final_delays)
+        return dict(
+            _stats,
+            avg_final_transcript_seconds=round(sum(delays) / len(delays), 3) if delays else 0.0,
+            max_final_transcript_seconds=round(max(delays), 3) if delays else 0.0,
+        )
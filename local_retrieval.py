@@ -0,0 +1,284 @@
+import hashlib
+import json
+import os
+import re
+import threading
+
+import numpy as np
+
+import doc_extract
+import openai_client
+
+# Local retrieval mode: answers come from a single chat-completion call fed
+# with the top-k chunks of the uploaded documents, skipping the Assistants
+# thread/run/poll round trips. Chunks are embedded with a pluggable embedder
+# (a deterministic hashing embedder works fully offline) and kept in a
+# persistent FAISS index that is updated incrementally on upload and delete.
+
+LOCAL_INDEX_DIR = os.getenv("LOCAL_INDEX_DIR", "local_index")
+LOCAL_EMBEDDER = os.getenv("LOCAL_EMBEDDER", "hashing")
+LOCAL_CHAT_MODEL = os.getenv("LOCAL_CHAT_MODEL", "gpt-4o-mini")
+LOCAL_TOP_K = int(os.getenv("LOCAL_TOP_K", "5"))
+CHUNK_SIZE = int(os.getenv("LOCAL_CHUNK_SIZE", "1000"))
+CHUNK_OVERLAP = int(os.getenv("LOCAL_CHUNK_OVERLAP", "150"))
+
+SYSTEM_PROMPT = (
+    "Give only text content that needs to be works in voice input, do not add any special characters or emojis or html codes. "
+    "You are an AI assistant that helps board members by answering questions based on uploaded meeting documents. "
+    "Use only the document excerpts below and provide concise, accurate responses. "
+    "If the excerpts do not contain the answer, say so."
+)
+
+
+# ---------- Embedders ----------
+
+class HashingEmbedder:
+    """Deterministic feature-hashing embedder (unigrams + bigrams); no network needed."""
+
+    name = "hashing"
+
+    def __init__(self, dim=1024):
+        self.dim = dim
+
+    def _bucket(self, token):
+        digest = int.from_bytes(hashlib.blake2b(token.encode("utf-8"), digest_size=8).digest(), "little")
+        return digest % self.dim, 1.0 if digest >> 63 else -1.0
+
+    def embed(self, texts):
+        vectors = np.zeros((len(texts), self.dim), dtype="float32")
+        for row, text in enumerate(texts):
+            words = re.findall(r"\w+", text.lower())
+            for token in words + [f"{a} {b}" for a, b in zip(words, words[1:])]:
+                index, sign = self._bucket(token)
+                vectors[row, index] += sign
+        # Sub-linear term frequency keeps long chunks from dominating
+        vectors = np.sign(vectors) * np.log1p(np.abs(vectors))
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return vectors / norms
+
+
+class OpenAIEmbedder:
+    """Embeddings from the OpenAI /embeddings endpoint via the shared client."""
+
+    name = "openai"
+
+    def __init__(self, model="text-embedding-3-small", dim=1536, batch_size=64):
+        self.model = model
+        self.dim = dim
+        self.batch_size = batch_size
+
+    def embed(self, texts):
+        vectors = []
+        for start in range(0, len(texts), self.batch_size):
+            batch = texts[start:start + self.batch_size]
+            response = openai_client.post("/embeddings", json={"model": self.model, "input": batch})
+            if response.status_code != 200:
+                raise RuntimeError(f"Embedding request failed: {response.text}")
+            data = sorted(response.json()["data"], key=lambda item: item["index"])
+            vectors.extend(item["embedding"] for item in data)
+        vectors = np.asarray(vectors, dtype="float32").reshape(len(texts), self.dim)
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return vectors / norms
+
+
+EMBEDDERS = {
+    HashingEmbedder.name: HashingEmbedder,
+    OpenAIEmbedder.name: OpenAIEmbedder,
+}
+
+
+def register_embedder(name, factory):
+    """Plug in another embedder: factory() must return an object with name, dim and embed(texts)."""
+    EMBEDDERS[name] = factory
+
+
+# ---------- Text extraction and chunking ----------
+
+def extract_text(path):
+    """Plain text of a PDF, DOCX or text file (cached by content hash)."""
+    with open(path, "rb") as f:
+        data = f.read()
+    try:
+        return doc_extract.extract_document_text(path, data)
+    except UnicodeDecodeError:
+        return data.decode("utf-8", errors="ignore")
+
+
+def chunk_text(text):
+    from langchain_text_splitters import RecursiveCharacterTextSplitter
+    splitter = RecursiveCharacterTextSplitter(chunk_size=CHUNK_SIZE, chunk_overlap=CHUNK_OVERLAP)
+    return [chunk for chunk in splitter.split_text(text) if chunk.strip()]
+
+
+# ---------- Persistent index ----------
+
+class LocalIndex:
+    """FAISS inner-product index over normalised chunk vectors, plus chunk metadata on disk."""
+
+    def __init__(self, directory=LOCAL_INDEX_DIR, embedder=None):
+        self.directory = directory
+        self.embedder = embedder or EMBEDDERS[LOCAL_EMBEDDER]()
+        self.index_path = os.path.join(directory, "chunks.faiss")
+        self.meta_path = os.path.join(directory, "chunks.json")
+        self._lock = threading.RLock()
+        self._load()
+
+    def _new_index(self):
+        import faiss
+        return faiss.IndexIDMap2(faiss.IndexFlatIP(self.embedder.dim))
+
+    def _load(self):
+        import faiss
+        os.makedirs(self.directory, exist_ok=True)
+        self.meta = {"embedder": self.embedder.name, "dim": self.embedder.dim, "next_id": 0, "chunks": {}, "files": {}}
+        self.index = self._new_index()
+        if os.path.exists(self.index_path) and os.path.exists(self.meta_path):
+            with open(self.meta_path, "r") as f:
+                meta = json.load(f)
+            # Vectors from a different embedder are not comparable: start over
+            if meta.get("embedder") == self.embedder.name and meta.get("dim") == self.embedder.dim:
+                self.meta = meta
+                self.index = faiss.read_index(self.index_path)
+            else:
+                print("⚠️ Local index was built with another embedder; it will be rebuilt.")
+
+    def _save(self):
+        import faiss
+        faiss.write_index(self.index, f"{self.index_path}.tmp")
+        os.replace(f"{self.index_path}.tmp", self.index_path)
+        with open(f"{self.meta_path}.tmp", "w") as f:
+            json.dump(self.meta, f)
+        os.replace(f"{self.meta_path}.tmp", self.meta_path)
+
+    def file_ids(self):
+        with self._lock:
+            return set(self.meta["files"])
+
+    def add_document(self, file_id, file_name, path):
+        """Chunk, embed and index one document (replacing any earlier version)."""
+        chunks = chunk_text(extract_text(path))
+        vectors = self.embedder.embed(chunks) if chunks else None
+        with self._lock:
+            self._remove(file_id)
+            start = self.meta["next_id"]
+            ids = list(range(start, start + len(chunks)))
+            if chunks:
+                self.index.add_with_ids(vectors, np.asarray(ids, dtype="int64"))
+            for chunk_id, chunk in zip(ids, chunks):
+                self.meta["chunks"][str(chunk_id)] = {"file_id": file_id, "file_name": file_name, "text": chunk}
+            self.meta["files"][file_id] = ids
+            self.meta["next_id"] = start + len(chunks)
+            self._save()
+        print(f"✅ Indexed {len(chunks)} chunk(s) locally for {file_name}")
+
+    def _remove(self, file_id):
+        ids = self.meta["files"].pop(file_id, [])
+        if ids:
+            self.index.remove_ids(np.asarray(ids, dtype="int64"))
+            for chunk_id in ids:
+                self.meta["chunks"].pop(str(chunk_id), None)
+        return len(ids)
+
+    def remove_document(self, file_id):
+        with self._lock:
+            if self._remove(file_id):
+                self._save()
+
+    def search(self, query, k=LOCAL_TOP_K):
+        """Top-k chunks for the query as [{"file_name", "text", "score"}]."""
+        vector = self.embedder.embed([query])
+        with self._lock:
+            if self.index.ntotal == 0:
+                return []
+            scores, ids = self.index.search(vector, min(k, self.index.ntotal))
+            results = []
+            for score, chunk_id in zip(scores[0], ids[0]):
+                chunk = self.meta["chunks"].get(str(int(chunk_id)))
+                if chunk_id >= 0 and chunk:
+                    results.append(dict(chunk, score=float(score)))
+            return results
+
+    def get_stats(self):
+        with self._lock:
+            return {
+                "embedder": self.embedder.name,
+                "files": len(self.meta["files"]),
+                "chunks": int(self.index.ntotal),
+            }
+
+
+_index = None
+_index_lock = threading.Lock()
+
+
+def get_index():
+    global _index
+    if _index is None:
+        with _index_lock:
+            if _index is None:
+                _index = LocalIndex()
+    return _index
+
+
+def sync(files, upload_folder):
+    """
+    Bring the index in line with the registry: index files that are missing
+    and drop ones that are no longer registered. `files` is [{"file_id", "file_name"}].
+    """
+    index = get_index()
+    wanted = {}
+    for item in files:
+        wanted.setdefault(item["file_id"], item["file_name"])
+    for file_id in index.file_ids() - set(wanted):
+        index.remove_document(file_id)
+    for file_id, file_name in wanted.items():
+        if file_id in index.file_ids():
+            continue
+        path = os.path.join(upload_folder, file_name)
+        if os.path.exists(path):
+            try:
+                index.add_document(file_id, file_name, path)
+            except Exception as e:
+                print(f"⚠️ Could not index {file_name} locally: {e}")
+
+
+# ---------- Answering ----------
+
+def build_messages(query, chunks):
+    context = "\n\n".join(f"[{chunk['file_name']}]\n{chunk['text']}" for chunk in chunks)
+    return [
+        {"role": "system", "content": f"{SYSTEM_PROMPT}\n\nDocument excerpts:\n{context}"},
+        {"role": "user", "content": query},
+    ]
+
+
+def answer(query, k=LOCAL_TOP_K):
+    """Answer from the top-k local chunks with one chat-completion call."""
+    messages = build_messages(query, get_index().search(query, k))
+    response = openai_client.post("/chat/completions", json={"model": LOCAL_CHAT_MODEL, "messages": messages})
+    if response.status_code != 200:
+        print(f"❌ Local answer failed. Error: {response.text}")
+        return None
+    return response.json()["choices"][0]["message"]["content"]
+
+
+def stream_answer(query, k=LOCAL_TOP_K):
+    """Like answer(), but yields text deltas from a streamed chat completion."""
+    messages = build_messages(query, get_index().search(query, k))
+    payload = {"model": LOCAL_CHAT_MODEL, "messages": messages, "stream": True}
+    with openai_client.post("/chat/completions", json=payload, stream=True) as response:
+        if response.status_code != 200:
+            raise RuntimeError(f"Failed to start streamed completion: {response.text}")
+        for _, data in openai_client.iter_sse_events(response):
+            if data == "[DONE]":
+                break
+            for choice in json.loads(data).get("choices", []):
+                delta = choice.get("delta", {}).get("content")
+                if delta:
+                    yield delta
+
+
+def get_stats():
+    return get_index().get_stats() if _index is not None else {"loaded": False}
@@ -0,0 +1,115 @@
+import contextlib
+import os
+import time
+
+import httpx
+
+import openai_client
+
+# Async counterpart of openai_client for the ASGI serving mode. One
+# httpx.AsyncClient (one connection pool) is shared by every coroutine in the
+# process, so hundreds of in-flight queries cost sockets, not threads.
+# Calls are recorded in the same per-endpoint stats as the sync client.
+
+ASYNC_MAX_CONNECTIONS = int(os.getenv("OPENAI_ASYNC_MAX_CONNECTIONS", "200"))
+ASYNC_MAX_KEEPALIVE = int(os.getenv("OPENAI_ASYNC_MAX_KEEPALIVE", "50"))
+
+_client = None
+
+
+def get_client():
+    """Return the process-wide AsyncClient, creating it on first use (inside the event loop)."""
+    global _client
+    if _client is None or _client.is_closed:
+        _client = httpx.AsyncClient(
+            headers={"Authorization": f"Bearer {openai_client.OPENAI_API_KEY}"},
+            limits=httpx.Limits(
+                max_connections=ASYNC_MAX_CONNECTIONS,
+                max_keepalive_connections=ASYNC_MAX_KEEPALIVE,
+            ),
+            timeout=httpx.Timeout(openai_client.READ_TIMEOUT, connect=openai_client.CONNECT_TIMEOUT),
+        )
+    return _client
+
+
+async def aclose():
+    global _client
+    if _client is not None:
+        await _client.aclose()
+        _client = None
+
+
+def _prepare(method, path, beta, headers):
+    url = openai_client.api_url(path)
+    request_headers = {}
+    if beta:
+        request_headers["OpenAI-Beta"] = openai_client.ASSISTANTS_BETA
+    if headers:
+        request_headers.update(headers)
+    return url, request_headers, openai_client.url_key(method, url)
+
+
+async def request(method, path, beta=False, headers=None, **kwargs):
+    """
+    Send a request to the OpenAI API through the shared AsyncClient.
+
+    Same conventions as openai_client.request; remaining kwargs (json, data,
+    files, params, timeout) are passed to httpx.
+    """
+    url, request_headers, key = _prepare(method, path, beta, headers)
+    started = time.perf_counter()
+    try:
+        response = await get_client().request(method, url, headers=request_headers, **kwargs)
+    except httpx.HTTPError:
+        openai_client.record_call(key, time.perf_counter() - started, False)
+        raise
+    openai_client.record_call(key, time.perf_counter() - started, response.status_code < 400)
+    return response
+
+
+@contextlib.asynccontextmanager
+async def stream(method, path, beta=False, headers=None, **kwargs):
+    """Like request(), but yields the response before its body is read (for SSE)."""
+    url, request_headers, key = _prepare(method, path, beta, headers)
+    started = time.perf_counter()
+    recorded = False
+    try:
+        async with get_client().stream(method, url, headers=request_headers, **kwargs) as response:
+            # Time to response headers, matching what the sync client records for stream=True
+            openai_client.record_call(key, time.perf_counter() - started, response.status_code < 400)
+            recorded = True
+            yield response
+    except httpx.HTTPError:
+        if not recorded:
+            openai_client.record_call(key, time.perf_counter() - started, False)
+        raise
+
+
+async def iter_sse_events(response):
+    """Async openai_client.iter_sse_events: (event, data) pairs from a streamed response."""
+    event, data_lines = None, []
+    async for line in response.aiter_lines():
+        if line == "":
+            if data_lines:
+                yield event or "message", "\n".join(data_lines)
+            event, data_lines = None, []
+        elif line.startswith(":"):
+            continue
+        elif line.startswith("event:"):
+            event = line[len("event:"):].strip()
+        elif line.startswith("data:"):
+            data_lines.append(line[len("data:"):].lstrip())
+    if data_lines:
+        yield event or "message", "\n".join(data_lines)
+
+
+async def get(path, **kwargs):
+    return await request("GET", path, **kwargs)
+
+
+async def post(path, **kwargs):
+    return await request("POST", path, **kwargs)
+
+
+async def delete(path, **kwargs):
+    return await request("DELETE", path, **kwargs)
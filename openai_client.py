@@ -0,0 +1,159 @@
+import os
+import re
+import threading
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+
+# Shared, pooled HTTP client for every call the app makes to the OpenAI REST API.
+# One keep-alive session means a voice turn reuses the same TCP+TLS connections
+# instead of doing a fresh handshake for each helper (and each polling step).
+
+OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
+OPENAI_API_BASE = os.getenv("OPENAI_API_BASE", "https://api.openai.com/v1").rstrip("/")
+
+POOL_CONNECTIONS = int(os.getenv("OPENAI_POOL_CONNECTIONS", "4"))
+POOL_MAXSIZE = int(os.getenv("OPENAI_POOL_MAXSIZE", "32"))
+POOL_BLOCK = os.getenv("OPENAI_POOL_BLOCK", "false").lower() in ("1", "true", "yes")
+CONNECT_TIMEOUT = float(os.getenv("OPENAI_CONNECT_TIMEOUT", "5"))
+READ_TIMEOUT = float(os.getenv("OPENAI_READ_TIMEOUT", "120"))
+
+ASSISTANTS_BETA = "assistants=v2"
+
+# Object IDs in URLs are collapsed so latency counters aggregate per endpoint,
+# e.g. /threads/thread_abc/runs/run_xyz -> /threads/{thread}/runs/{run}
+_ID_PATTERN = re.compile(r"/(thread|run|msg|file|vs|vsfb|asst|upload|part|step)[_-][A-Za-z0-9]{12,}")
+
+_session = None
+_session_lock = threading.Lock()
+_stats = {}
+_stats_lock = threading.Lock()
+
+
+def get_session():
+    """Return the process-wide keep-alive session, creating it on first use."""
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                session = requests.Session()
+                adapter = HTTPAdapter(
+                    pool_connections=POOL_CONNECTIONS,
+                    pool_maxsize=POOL_MAXSIZE,
+                    pool_block=POOL_BLOCK,
+                )
+                session.mount("https://", adapter)
+                session.mount("http://", adapter)
+                session.headers.update({"Authorization": f"Bearer {OPENAI_API_KEY}"})
+                _session = session
+    return _session
+
+
+def endpoint_key(method, path):
+    """Normalise a request path into a stats key such as 'GET /threads/{thread}/runs/{run}'."""
+    path = path.split("?", 1)[0]
+    return f"{method.upper()} {_ID_PATTERN.sub(lambda m: '/{' + m.group(1) + '}', path)}"
+
+
+def api_url(path):
+    return path if path.startswith("http") else f"{OPENAI_API_BASE}{path}"
+
+
+def url_key(method, url):
+    return endpoint_key(method, url[len(OPENAI_API_BASE):] if url.startswith(OPENAI_API_BASE) else url)
+
+
+def record_call(key, elapsed, ok):
+    """Add one call to the per-endpoint stats (shared with the async client)."""
+    with _stats_lock:
+        entry = _stats.setdefault(key, {"count": 0, "errors": 0, "total_ms": 0.0, "max_ms": 0.0})
+        elapsed_ms = elapsed * 1000
+        entry["count"] += 1
+        entry["total_ms"] += elapsed_ms
+        entry["max_ms"] = max(entry["max_ms"], elapsed_ms)
+        if not ok:
+            entry["errors"] += 1
+
+
+def request(method, path, beta=False, headers=None, timeout=None, **kwargs):
+    """
+    Send a request to the OpenAI API through the shared session.
+
+    `path` is relative to OPENAI_API_BASE (e.g. "/threads"); `beta` adds the
+    Assistants v2 header. Remaining kwargs (json, data, files, params, stream)
+    are passed straight to requests.
+    """
+    url = api_url(path)
+    request_headers = {}
+    if beta:
+        request_headers["OpenAI-Beta"] = ASSISTANTS_BETA
+    if headers:
+        request_headers.update(headers)
+
+    key = url_key(method, url)
+    started = time.perf_counter()
+    try:
+        response = get_session().request(
+            method,
+            url,
+            headers=request_headers,
+            timeout=timeout or (CONNECT_TIMEOUT, READ_TIMEOUT),
+            **kwargs,
+        )
+    except requests.RequestException:
+        record_call(key, time.perf_counter() - started, False)
+        raise
+    record_call(key, time.perf_counter() - started, response.status_code < 400)
+    return response
+
+
+def get(path, **kwargs):
+    return request("GET", path, **kwargs)
+
+
+def post(path, **kwargs):
+    return request("POST", path, **kwargs)
+
+
+def delete(path, **kwargs):
+    return request("DELETE", path, **kwargs)
+
+
+def get_stats():
+    """Per-endpoint call counts and latencies (ms) since process start."""
+    with _stats_lock:
+        return {
+            key: {
+                "count": entry["count"],
+                "errors": entry["errors"],
+                "avg_ms": round(entry["total_ms"] / entry["count"], 1) if entry["count"] else 0.0,
+                "max_ms": round(entry["max_ms"], 1),
+            }
+            for key, entry in _stats.items()
+        }
+
+
+def iter_sse_events(response):
+    """
+    Parse a streamed (text/event-stream) response into (event, data) pairs.
+
+    `data` is the raw payload string; the Assistants stream ends with
+    ("done", "[DONE]").
+    """
+    event, data_lines = None, []
+    for line in response.iter_lines(decode_unicode=True):
+        if line is None:
+            continue
+        if line == "":
+            if data_lines:
+                yield event or "message", "\n".join(data_lines)
+            event, data_lines = None, []
+        elif line.startswith(":"):
+            continue
+        elif line.startswith("event:"):
+            event = line[len("event:"):].strip()
+        elif line.startswith("data:"):
+            data_lines.append(line[len("data:"):].lstrip())
+    if data_lines:
+        yield event or "message", "\n".join(data_lines)
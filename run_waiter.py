@@ -0,0 +1,248 @@
+import heapq
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+
+import openai_client
+
+# One background waiter for every in-flight Assistants run. Instead of each
+# request looping on GET /runs/{id} with a fixed sleep, callers register the
+# run and block on a Future. A single scheduler polls all runs with adaptive
+# intervals (quick at first, then backing off), enforces a per-run deadline
+# and cancels runs that exceed it. A cancelled run keeps being polled until it
+# has actually stopped, so the thread is free for the next run when the
+# caller's Future resolves.
+#
+# The ASGI app awaits runs with its own coroutine poller (asgi_app.wait_for_run)
+# using the same intervals and deadlines, so RUN_POLL_WORKERS only has to cover
+# the runs started by the Flask routes; record_run() keeps both in one set of stats.
+
+RUN_DEADLINE_SECONDS = float(os.getenv("RUN_DEADLINE_SECONDS", "90"))
+RUN_POLL_FIRST_INTERVAL = float(os.getenv("RUN_POLL_FIRST_INTERVAL", "0.3"))
+RUN_POLL_MAX_INTERVAL = float(os.getenv("RUN_POLL_MAX_INTERVAL", "2"))
+RUN_POLL_BACKOFF = 1.5
+RUN_POLL_WORKERS = int(os.getenv("RUN_POLL_WORKERS", "4"))
+RUN_CANCEL_SETTLE_SECONDS = float(os.getenv("RUN_CANCEL_SETTLE_SECONDS", "10"))
+
+TERMINAL_STATES = ("completed", "failed", "cancelled", "expired", "incomplete")
+
+
+class RunTimeoutError(Exception):
+    """The run did not finish before its deadline and was cancelled."""
+
+
+_cond = threading.Condition()
+_runs = {}   # (thread_id, run_id) -> entry
+_heap = []   # (next_poll_at, thread_id, run_id)
+_scheduler = None
+_poll_executor = ThreadPoolExecutor(max_workers=RUN_POLL_WORKERS, thread_name_prefix="run-poll")
+_stats = {"runs": 0, "polls": 0, "timeouts": 0, "errors": 0}
+_waits = deque(maxlen=1000)  # (seconds waited, polls) per finished run
+
+
+def watch(thread_id, run_id, deadline=None):
+    """
+    Register a run and return a Future resolved with the final run object.
+    `deadline` is in seconds from now (default RUN_DEADLINE_SECONDS).
+    """
+    return _register((thread_id, run_id), deadline or RUN_DEADLINE_SECONDS)
+
+
+def cancel_and_wait(thread_id, run_id):
+    """
+    Cancel a run and block until it has stopped (at most RUN_CANCEL_SETTLE_SECONDS);
+    returns the last run object seen, or None.
+    """
+    cancel_run(thread_id, run_id)
+    try:
+        return _register((thread_id, run_id), RUN_CANCEL_SETTLE_SECONDS, cancelling=True).result()
+    except Exception as e:
+        print(f"⚠️ Run {run_id} may still be active: {e}")
+        return None
+
+
+def _register(key, deadline, cancelling=False):
+    global _scheduler
+    thread_id, run_id = key
+    now = time.time()
+    with _cond:
+        entry = _runs.get(key)
+        if entry is not None:
+            return entry["future"]
+        entry = _runs[key] = {
+            "future": Future(),
+            "started_at": now,
+            "deadline": now + deadline,
+            "interval": RUN_POLL_FIRST_INTERVAL,
+            "polls": 0,
+            # Set once a cancel was requested: the outcome to report when the run stops
+            "cancelling": cancelling,
+            "error": None,
+            "run": None,
+        }
+        _stats["runs"] += 1
+        heapq.heappush(_heap, (now + RUN_POLL_FIRST_INTERVAL, thread_id, run_id))
+        if _scheduler is None or not _scheduler.is_alive():
+            _scheduler = threading.Thread(target=_schedule, name="run-waiter", daemon=True)
+            _scheduler.start()
+        _cond.notify()
+    return entry["future"]
+
+
+def wait_for_run(thread_id, run_id, deadline=None):
+    """Block until the run is terminal; returns the run object or raises RunTimeoutError."""
+    return watch(thread_id, run_id, deadline).result()
+
+
+def cancel_run(thread_id, run_id):
+    try:
+        response = openai_client.post(f"/threads/{thread_id}/runs/{run_id}/cancel", beta=True)
+        print(f"⚠️ Cancel requested for run {run_id}: {response.status_code}")
+    except Exception as e:
+        print(f"⚠️ Failed to cancel run {run_id}: {e}")
+
+
+def _schedule():
+    while True:
+        with _cond:
+            while not _heap:
+                _cond.wait()
+            next_at, thread_id, run_id = _heap[0]
+            delay = next_at - time.time()
+            if delay > 0:
+                _cond.wait(timeout=delay)
+                continue
+            heapq.heappop(_heap)
+            if (thread_id, run_id) not in _runs:
+                continue
+        _poll_executor.submit(_poll, thread_id, run_id)
+
+
+def next_interval(interval):
+    """The back-off step shared by both pollers."""
+    return min(interval * RUN_POLL_BACKOFF, RUN_POLL_MAX_INTERVAL)
+
+
+def record_run(waited, polls, errors=0, timed_out=False):
+    """Add a run awaited outside this scheduler (the ASGI poller) to the stats."""
+    with _cond:
+        _stats["runs"] += 1
+        _stats["polls"] += polls
+        _stats["errors"] += errors
+        _stats["timeouts"] += int(timed_out)
+        _waits.append((waited, polls))
+
+
+def _finish(key, result=None, error=None):
+    with _cond:
+        entry = _runs.pop(key, None)
+        if entry is None:
+            return
+        _waits.append((time.time() - entry["started_at"], entry["polls"]))
+    if error is not None:
+        entry["future"].set_exception(error)
+    else:
+        entry["future"].set_result(result)
+
+
+def _reschedule(key):
+    with _cond:
+        entry = _runs.get(key)
+        if entry is None:
+            return
+        entry["interval"] = next_interval(entry["interval"])
+        next_at = min(time.time() + entry["interval"], entry["deadline"])
+        heapq.heappush(_heap, (next_at, key[0], key[1]))
+        _cond.notify()
+
+
+def _start_cancel(key, run=None, error=None):
+    """Request cancellation and keep polling until the run leaves the active states."""
+    cancel_run(*key)
+    with _cond:
+        entry = _runs.get(key)
+        if entry is None:
+            return
+        entry.update(cancelling=True, run=run, error=error, interval=RUN_POLL_FIRST_INTERVAL,
+                     deadline=time.time() + RUN_CANCEL_SETTLE_SECONDS)
+    _reschedule(key)
+
+
+def _settle(key, run=None):
+    """Resolve a cancelled run's Future with the outcome recorded when it was cancelled."""
+    with _cond:
+        entry = _runs.get(key)
+        if entry is None:
+            return
+        error, run = entry["error"], run or entry["run"]
+    _finish(key, result=run, error=error)
+
+
+def _poll(thread_id, run_id):
+    key = (thread_id, run_id)
+    with _cond:
+        entry = _runs.get(key)
+        if entry is None:
+            return
+        entry["polls"] += 1
+        _stats["polls"] += 1
+        deadline = entry["deadline"]
+        cancelling = entry["cancelling"]
+
+    if time.time() >= deadline:
+        if cancelling:
+            print(f"⚠️ Run {run_id} still active {RUN_CANCEL_SETTLE_SECONDS:g}s after cancel")
+            _settle(key)
+            return
+        with _cond:
+            _stats["timeouts"] += 1
+        _start_cancel(key, error=RunTimeoutError(f"Run {run_id} exceeded its deadline"))
+        return
+
+    try:
+        response = openai_client.get(f"/threads/{thread_id}/runs/{run_id}", beta=True)
+    except Exception as e:
+        print(f"⚠️ Failed to check run status: {e}")
+        with _cond:
+            _stats["errors"] += 1
+        _reschedule(key)
+        return
+
+    if response.status_code != 200:
+        print(f"⚠️ Failed to check run status. Error: {response.text}")
+        with _cond:
+            _stats["errors"] += 1
+        if 400 <= response.status_code < 500 and response.status_code != 429:
+            _finish(key, error=RuntimeError(f"Run {run_id} lookup failed: {response.status_code}"))
+        else:
+            _reschedule(key)
+        return
+
+    run = response.json()
+    status = run.get("status")
+    if cancelling:
+        if status in TERMINAL_STATES:
+            _settle(key, run)
+        else:
+            _reschedule(key)
+    elif status in TERMINAL_STATES:
+        _finish(key, result=run)
+    elif status == "requires_action":
+        # The assistant only uses file_search, so nothing here can submit tool outputs.
+        _start_cancel(key, run=run)
+    else:
+        _reschedule(key)
+
+
+def get_stats():
+    with _cond:
+        waits = list(_waits)
+        return dict(
+            _stats,
+            in_flight=len(_runs),
+            avg_wait_seconds=round(sum(w for w, _ in waits) / len(waits), 3) if waits else 0.0,
+            max_wait_seconds=round(max(w for w, _ in waits), 3) if waits else 0.0,
+            avg_polls_per_run=round(sum(p for _, p in waits) / len(waits), 2) if waits else 0.0,
+        )
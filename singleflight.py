@@ -0,0 +1,95 @@
+import asyncio
+import threading
+
+# Single-flight request coalescing: while a call for some key is in flight,
+# identical concurrent calls wait for it and share its result (or exception)
+# instead of issuing their own upstream request.
+
+_groups = {}
+_groups_lock = threading.Lock()
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+        self.waiters = 0
+
+
+class Group:
+    """A namespace of coalesced calls, e.g. one for replies, one for transcriptions."""
+
+    def __init__(self, name):
+        self.name = name
+        self._lock = threading.Lock()
+        self._calls = {}
+        self.executed = 0
+        self.coalesced = 0
+        with _groups_lock:
+            _groups[name] = self
+
+    def do(self, key, fn, *args, **kwargs):
+        """Run fn(*args, **kwargs) once per key at a time and share the outcome."""
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+                self.executed += 1
+            else:
+                call.waiters += 1
+                self.coalesced += 1
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = fn(*args, **kwargs)
+        except Exception as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+        return call.result
+
+    def stats(self):
+        with self._lock:
+            return {
+                "executed": self.executed,
+                "coalesced": self.coalesced,
+                "in_flight": len(self._calls),
+            }
+
+
+class AsyncGroup(Group):
+    """Coroutine flavour of Group for the ASGI app: waiters await the leader's task."""
+
+    async def do(self, key, fn, *args, **kwargs):
+        """Await fn(*args, **kwargs) once per key at a time and share the outcome."""
+        with self._lock:
+            task = self._calls.get(key)
+            if task is None:
+                task = self._calls[key] = asyncio.ensure_future(fn(*args, **kwargs))
+                task.add_done_callback(lambda _: self._forget(key, task))
+                self.executed += 1
+            else:
+                self.coalesced += 1
+        # shield: one caller disconnecting must not cancel the call for the others
+        return await asyncio.shield(task)
+
+    def _forget(self, key, task):
+        with self._lock:
+            if self._calls.get(key) is task:
+                del self._calls[key]
+
+
+def get_stats():
+    with _groups_lock:
+        groups = list(_groups.values())
+    return {group.name: group.stats() for group in groups}
@@ -1,9 +1,9 @@
 import os
 import streamlit as st
 import openai
-import docx
-import PyPDF2
-from io import BytesIO
+import doc_extract
+import context_select
+import transcript_summary
 import speech_recognition as sr
 
 # Set OpenAI API Key from environment variable
@@ -43,37 +43,38 @@ Please review the documents and cast your vote accordingly.
 """
 
 # Function to extract context from uploaded documents (PDF, DOCX, TXT)
+# Extraction runs page-parallel and is cached by content hash, so Streamlit
+# reruns with the same uploads skip it entirely (see doc_extract.py).
 def get_uploaded_documents_context(uploaded_files):
     context = {}
     if uploaded_files:
         for uploaded_file in uploaded_files:
             file_name = uploaded_file.name.lower()
             file_text = ""
-            if file_name.endswith('.docx'):
-                try:
-                    document = docx.Document(BytesIO(uploaded_file.read()))
-                    for para in document.paragraphs:
-                        file_text += para.text + "\n"
-                except Exception as e:
-                    st.warning(f"Could not read {uploaded_file.name}: {e}")
-            elif file_name.endswith('.pdf'):
-                try:
-                    pdf_reader = PyPDF2.PdfReader(uploaded_file)
-                    for page in pdf_reader.pages:
-                        page_text = page.extract_text()
-                        if page_text:
-                            file_text += page_text + "\n"
-                except Exception as e:
-                    st.warning(f"Could not read {uploaded_file.name}: {e}")
-            else:
-                try:
-                    file_text = uploaded_file.read().decode("utf-8")
-                except Exception as e:
-                    st.warning(f"Could not read {uploaded_file.name}. Only text-based files are supported.")
+            try:
+                file_text = doc_extract.extract_document_text(file_name, uploaded_file.getvalue())
+            except UnicodeDecodeError:
+                st.warning(f"Could not read {uploaded_file.name}. Only text-based files are supported.")
+            except Exception as e:
+                st.warning(f"Could not read {uploaded_file.name}: {e}")
             
             context[file_name] = file_text
     return context
 
+# Build (or reuse) the BM25 index over the uploaded documents; rebuilt only when uploads change
+def get_context_index(document_context):
+    key = context_select.fingerprint(document_context)
+    if st.session_state.get("context_index_key") != key:
+        st.session_state.context_index = context_select.BM25Index(document_context)
+        st.session_state.context_index_key = key
+    return st.session_state.context_index
+
+# Pick the chunks most relevant to the query, within the prompt token budget
+def assemble_context(query, document_context):
+    if not document_context:
+        return "", []
+    return context_select.select_context(get_context_index(document_context), query)
+
 # Function to query OpenAI with the given query and document context
 def ask_openai(query, document_context):
     messages = [
@@ -90,6 +91,15 @@ def ask_openai(query, document_context):
     except Exception as e:
         return f"Error contacting OpenAI: {e}"
 
+# Single completion used by the transcript summarizer for every map and reduce step
+def summarize_text(instruction, text):
+    messages = [
+        {"role": "system", "content": instruction},
+        {"role": "user", "content": text}
+    ]
+    response = openai.ChatCompletion.create(model="gpt-3.5-turbo", messages=messages)
+    return response['choices'][0]['message']['content']
+
 # Function for annotating the document content (inline comments or highlighting)
 def annotate_document(file_name, document_content):
     st.text_area(f"Annotations for {file_name}", document_content, height=200)
@@ -104,6 +114,8 @@ def main():
         st.session_state.annotations = {}
     if "transcript" not in st.session_state:
         st.session_state.transcript = ""  # Initialize transcript as an empty string
+    if "rolling_summary" not in st.session_state:
+        st.session_state.rolling_summary = transcript_summary.RollingSummary(summarize_text)
 
     st.set_page_config(page_title="Governa Board Meeting Assistant", layout="wide")
 
@@ -140,6 +152,7 @@ def main():
         if uploaded_files:
             context = get_uploaded_documents_context(uploaded_files)
             st.session_state.document_context = context
+            get_context_index(context)
             st.success("Documents uploaded and context set successfully!")
             
             # Display document content and allow for annotations
@@ -166,9 +179,12 @@ def main():
         if st.button("Submit Query"):
             if user_query:
                 with st.spinner("Contacting OpenAI..."):
-                    answer = ask_openai(user_query, document_context)
+                    context_text, sources = assemble_context(user_query, document_context)
+                    answer = ask_openai(user_query, context_text)
                     st.markdown("### Response")
                     st.write(answer)
+                    if sources:
+                        st.caption("Sources: " + ", ".join(sources))
             else:
                 st.error("Please enter a query before submitting.")
 
@@ -185,6 +201,8 @@ def main():
                     audio_data = recognizer.record(source)
                 clip_text = recognizer.recognize_google(audio_data)
                 st.session_state.transcript += clip_text + "\n"
+                # Summarize completed segments in the background while the meeting goes on
+                st.session_state.rolling_summary.update(st.session_state.transcript)
                 st.success("Audio clip processed and added to transcript!")
             except Exception as e:
                 st.error(f"Error processing audio clip: {e}")
@@ -193,9 +211,11 @@ def main():
 
         if st.button("Summarize Transcript"):
             if st.session_state.transcript.strip():
-                summary_query = "Summarize the following meeting transcript: " + st.session_state.transcript
                 with st.spinner("Summarizing transcript..."):
-                    summary = ask_openai(summary_query, "")
+                    try:
+                        summary = st.session_state.rolling_summary.summary(st.session_state.transcript)
+                    except Exception as e:
+                        summary = f"Error contacting OpenAI: {e}"
                     st.markdown("### Transcript Summary")
                     st.write(summary)
             else:
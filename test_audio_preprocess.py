@@ -0,0 +1,82 @@
+import hashlib
+import os
+import wave
+
+import pytest
+
+np = pytest.importorskip("numpy")
+pytest.importorskip("av")
+
+import audio_preprocess
+
+
+def write_wav(path, samples, rate, channels):
+    with wave.open(path, "wb") as wav:
+        wav.setnchannels(channels)
+        wav.setsampwidth(2)
+        wav.setframerate(rate)
+        wav.writeframes(samples.astype("<i2").tobytes())
+
+
+def synthetic_clip(rate=48000, lead=1.0, speech=2.0, tail=1.5, seed=7):
+    """Stereo clip: faint noise, a 2 s voiced-like tone burst, faint noise."""
+    rng = np.random.default_rng(seed)
+    t = np.arange(int(speech * rate)) / rate
+    voiced = (0.3 * np.sin(2 * np.pi * 220 * t) + 0.15 * np.sin(2 * np.pi * 660 * t)) * 32767
+    noise = lambda seconds: rng.normal(0, 20, int(seconds * rate))  # about -64 dBFS
+    mono = np.concatenate([noise(lead), voiced + noise(speech), noise(tail)])
+    return np.stack([mono, mono], axis=1).reshape(-1), lead, speech
+
+
+@pytest.fixture
+def clip(tmp_path):
+    samples, lead, speech = synthetic_clip()
+    path = str(tmp_path / "clip.wav")
+    write_wav(path, samples, 48000, 2)
+    return path, lead, speech
+
+
+def test_decode_downmixes_and_resamples(clip):
+    path, _, _ = clip
+    decoded = audio_preprocess.decode_mono_16k(path)
+    assert abs(len(decoded) / audio_preprocess.TARGET_RATE - 4.5) < 0.05
+
+
+def test_speech_bounds_are_padded(clip):
+    path, lead, speech = clip
+    rate = audio_preprocess.TARGET_RATE
+    pad = audio_preprocess.PAD_MS / 1000
+    start, end = audio_preprocess.speech_bounds(audio_preprocess.decode_mono_16k(path))
+    assert abs(start / rate - (lead - pad)) <= 0.03
+    assert abs(end / rate - (lead + speech + pad)) <= 0.03
+
+
+def test_preprocess_trims_and_compresses(clip):
+    path, _, speech = clip
+    out = audio_preprocess.preprocess(path)
+    assert out.endswith(".16k.ogg") and out != path
+    roundtrip = audio_preprocess.decode_mono_16k(out)
+    pad = audio_preprocess.PAD_MS / 1000
+    assert abs(len(roundtrip) / audio_preprocess.TARGET_RATE - (speech + 2 * pad)) < 0.1
+    assert os.path.getsize(out) / os.path.getsize(path) < 0.05
+
+
+def test_silent_clip_returns_none(tmp_path):
+    path = str(tmp_path / "silent.wav")
+    write_wav(path, np.zeros(48000 * 2, dtype=np.int16), 48000, 2)
+    assert audio_preprocess.preprocess(path) is None
+
+
+def test_undecodable_clip_returns_original(tmp_path):
+    path = tmp_path / "broken.webm"
+    path.write_bytes(b"not audio")
+    assert audio_preprocess.preprocess(str(path)) == str(path)
+
+
+def test_identical_clips_encode_identically(clip, tmp_path):
+    """The Ogg/Opus output is deterministic: the same clip encodes byte-for-byte the same."""
+    path, _, _ = clip
+    first = audio_preprocess.preprocess(path, str(tmp_path / "first.ogg"))
+    second = audio_preprocess.preprocess(path, str(tmp_path / "second.ogg"))
+    digest = lambda p: hashlib.sha256(open(p, "rb").read()).hexdigest()
+    assert digest(first) == digest(second)
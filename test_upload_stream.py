@@ -0,0 +1,28 @@
+import hashlib
+import io
+
+import pytest
+
+pytest.importorskip("requests")
+MultipartEncoder = pytest.importorskip("requests_toolbelt").MultipartEncoder
+
+import upload_stream
+
+
+def test_multipart_encoder_drains_hashing_reader(tmp_path):
+    data = bytes(range(256)) * 4000  # ~1 MB, several encoder chunks
+    tee_path = tmp_path / "copy.pdf"
+    reader = upload_stream.HashingReader(io.BytesIO(data), len(data), str(tee_path))
+    encoder = MultipartEncoder(fields={"purpose": "assistants", "file": ("pack.pdf", reader, "application/pdf")})
+    expected = encoder.len
+
+    body = b""
+    while chunk := encoder.read(8192):
+        body += chunk
+    reader.close()
+
+    assert len(body) == expected
+    assert data in body
+    assert len(reader) == 0
+    assert reader.hexdigest() == hashlib.sha256(data).hexdigest()
+    assert tee_path.read_bytes() == data
@@ -0,0 +1,198 @@
+import os
+import threading
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
+
+import openai_client
+import thread_registry
+
+# Thread compaction. Every run re-reads the whole thread, so latency and token
+# cost creep up as a meeting goes on. Message and token counts are tracked per
+# thread from each run's usage; once a thread crosses a threshold, the session
+# is moved (in the background, after the answer was delivered) to a fresh
+# thread seeded with a compact summary of the old one. Run latency is recorded
+# for the runs just before and just after each compaction.
+
+THREAD_MAX_MESSAGES = int(os.getenv("THREAD_MAX_MESSAGES", "40"))
+THREAD_MAX_PROMPT_TOKENS = int(os.getenv("THREAD_MAX_PROMPT_TOKENS", "20000"))
+COMPACTION_MODEL = os.getenv("COMPACTION_MODEL", "gpt-4o-mini")
+SUMMARY_SOURCE_MESSAGES = 100   # most recent messages read when summarizing
+SUMMARY_MESSAGE_CHARS = 2000    # per-message cap in the summarization prompt
+LATENCY_WINDOW = 5              # runs averaged on each side of a compaction
+MAX_TRACKED_THREADS = 1000
+
+SUMMARY_PROMPT = (
+    "Summarize this conversation between a board member and their meeting assistant so it can "
+    "continue in a new thread. Keep the questions asked, the facts and figures given in answers, "
+    "decisions and open items. Be concise; plain text only."
+)
+
+_lock = threading.Lock()
+_threads = OrderedDict()  # thread_id -> usage record
+_compactions = deque(maxlen=50)
+_stats = {"runs": 0, "compactions": 0, "failed": 0}
+_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="thread-compact")
+
+
+def _record_for(thread_id):
+    """Usage record for a thread, created on first sight. Caller holds _lock."""
+    record = _threads.get(thread_id)
+    if record is None:
+        record = _threads[thread_id] = {
+            "messages": 0, "runs": 0, "total_tokens": 0, "last_prompt_tokens": 0,
+            "latencies": deque(maxlen=LATENCY_WINDOW), "compaction": None, "compacting": False,
+        }
+        while len(_threads) > MAX_TRACKED_THREADS:
+            _threads.popitem(last=False)
+    _threads.move_to_end(thread_id)
+    return record
+
+
+def record_run(thread_id, run, elapsed):
+    """Account one finished run: its usage (prompt tokens ~ thread size) and latency in seconds."""
+    usage = (run or {}).get("usage") or {}
+    with _lock:
+        _stats["runs"] += 1
+        record = _record_for(thread_id)
+        record["runs"] += 1
+        record["messages"] += 2  # the question and the answer
+        record["total_tokens"] += usage.get("total_tokens", 0)
+        record["last_prompt_tokens"] = usage.get("prompt_tokens", record["last_prompt_tokens"])
+        record["latencies"].append(elapsed)
+        compaction = record["compaction"]
+        if compaction is not None and compaction["after_runs"] < LATENCY_WINDOW:
+            compaction["after_total"] += elapsed
+            compaction["after_runs"] += 1
+
+
+def needs_compaction(thread_id):
+    with _lock:
+        record = _threads.get(thread_id)
+        if record is None or record["compacting"]:
+            return False
+        return (record["messages"] >= THREAD_MAX_MESSAGES
+                or record["last_prompt_tokens"] >= THREAD_MAX_PROMPT_TOKENS)
+
+
+def maybe_compact(session_id, thread_id, create_thread):
+    """
+    Schedule compaction if the thread crossed a threshold. create_thread(seed_messages)
+    must create a thread seeded with those messages and return its ID (or None).
+    """
+    if not needs_compaction(thread_id):
+        return False
+    with _lock:
+        record = _record_for(thread_id)
+        if record["compacting"]:
+            return False
+        record["compacting"] = True
+    _executor.submit(_compact, session_id, thread_id, create_thread)
+    return True
+
+
+def _thread_transcript(thread_id):
+    response = openai_client.get(f"/threads/{thread_id}/messages", beta=True,
+                                 params={"limit": SUMMARY_SOURCE_MESSAGES, "order": "desc"})
+    if response.status_code != 200:
+        raise RuntimeError(f"Failed to read thread: {response.text}")
+    lines = []
+    for message in reversed(response.json()["data"]):
+        text = " ".join(part["text"]["value"] for part in message["content"] if part.get("type") == "text")
+        if text.strip():
+            speaker = "Assistant" if message["role"] == "assistant" else "User"
+            lines.append(f"{speaker}: {text.strip()[:SUMMARY_MESSAGE_CHARS]}")
+    return "\n".join(lines)
+
+
+def summarize_thread(thread_id):
+    transcript = _thread_transcript(thread_id)
+    if not transcript:
+        return ""
+    response = openai_client.post("/chat/completions", json={
+        "model": COMPACTION_MODEL,
+        "messages": [{"role": "system", "content": SUMMARY_PROMPT}, {"role": "user", "content": transcript}],
+    })
+    if response.status_code != 200:
+        raise RuntimeError(f"Summary request failed: {response.text}")
+    return response.json()["choices"][0]["message"]["content"]
+
+
+def _discard_thread(thread_id):
+    try:
+        openai_client.delete(f"/threads/{thread_id}", beta=True)
+    except Exception as e:
+        print(f"⚠️ Could not delete unused thread {thread_id}: {e}")
+
+
+def _compact(session_id, thread_id, create_thread):
+    started = time.perf_counter()
+    try:
+        # Nothing to do if something else (e.g. a KB reset) already rebound the session
+        if thread_registry.lookup(session_id) != thread_id:
+            with _lock:
+                _record_for(thread_id)["compacting"] = False
+            return None
+        summary = summarize_thread(thread_id)
+        seed = [{"role": "assistant", "content": f"Summary of our conversation so far:\n{summary}"}] if summary else []
+        new_thread_id = create_thread(seed)
+        if not new_thread_id:
+            raise RuntimeError("Could not create the replacement thread")
+        if not thread_registry.rebind(session_id, thread_id, new_thread_id):
+            # Rebound while we were summarizing: the replacement is nobody's thread
+            _discard_thread(new_thread_id)
+            with _lock:
+                _record_for(thread_id)["compacting"] = False
+            return None
+    except Exception as e:
+        print(f"⚠️ Thread compaction failed for {thread_id}: {e}")
+        with _lock:
+            _stats["failed"] += 1
+            _record_for(thread_id)["compacting"] = False
+        return None
+
+    with _lock:
+        old = _record_for(thread_id)
+        latencies = list(old["latencies"])
+        compaction = {
+            "from_thread": thread_id,
+            "to_thread": new_thread_id,
+            "at": time.time(),
+            "messages": old["messages"],
+            "prompt_tokens": old["last_prompt_tokens"],
+            "summary_seconds": round(time.perf_counter() - started, 2),
+            "before_avg_seconds": round(sum(latencies) / len(latencies), 3) if latencies else 0.0,
+            "after_total": 0.0,
+            "after_runs": 0,
+        }
+        new = _record_for(new_thread_id)
+        new["messages"] = 1 if summary else 0
+        new["compaction"] = compaction
+        _compactions.append(compaction)
+        _stats["compactions"] += 1
+    print(f"✅ Thread {thread_id} compacted into {new_thread_id} "
+          f"({compaction['messages']} messages, {compaction['prompt_tokens']} prompt tokens)")
+    return new_thread_id
+
+
+def get_stats():
+    with _lock:
+        compactions = []
+        for c in _compactions:
+            compactions.append({
+                "from_thread": c["from_thread"],
+                "to_thread": c["to_thread"],
+                "messages": c["messages"],
+                "prompt_tokens": c["prompt_tokens"],
+                "summary_seconds": c["summary_seconds"],
+                "before_avg_seconds": c["before_avg_seconds"],
+                "after_avg_seconds": round(c["after_total"] / c["after_runs"], 3) if c["after_runs"] else None,
+            })
+        measured = [c for c in compactions if c["after_avg_seconds"] is not None]
+        return dict(
+            _stats,
+            tracked_threads=len(_threads),
+            avg_before_seconds=round(sum(c["before_avg_seconds"] for c in measured) / len(measured), 3) if measured else 0.0,
+            avg_after_seconds=round(sum(c["after_avg_seconds"] for c in measured) / len(measured), 3) if measured else 0.0,
+            recent=compactions[-10:],
+        )
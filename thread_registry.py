@@ -0,0 +1,142 @@
+import json
+import os
+import threading
+import weakref
+from collections import OrderedDict
+
+import singleflight
+
+# In-memory map of browser session -> Assistants thread, written through to
+# thread.json so it survives restarts. Each session gets its own thread, and
+# runs on a thread are serialised with a per-thread lock because OpenAI rejects
+# a new run while another one is active on the same thread.
+
+THREAD_FILE = os.getenv("THREAD_FILE", "thread.json")
+MAX_SESSIONS = int(os.getenv("THREAD_REGISTRY_MAX_SESSIONS", "1000"))
+DEFAULT_SESSION = "default"
+
+_lock = threading.Lock()
+_sessions = OrderedDict()  # session_id -> thread_id, least recently used first
+_thread_locks = weakref.WeakValueDictionary()  # thread_id -> lock, kept alive by whoever holds it
+_loaded = False
+_creation_flight = singleflight.Group("thread_creation")
+
+
+def _load():
+    """Read thread.json once. Caller holds _lock."""
+    global _loaded
+    if _loaded:
+        return
+    if os.path.exists(THREAD_FILE):
+        try:
+            with open(THREAD_FILE, "r") as f:
+                data = json.load(f)
+            # Older files only hold the single shared thread
+            if data.get("thread_id"):
+                _sessions[DEFAULT_SESSION] = data["thread_id"]
+            _sessions.update(data.get("sessions", {}))
+        except (OSError, ValueError) as e:
+            print(f"⚠️ Could not read {THREAD_FILE}: {e}")
+    _loaded = True
+
+
+def _persist():
+    """Write the registry to disk atomically. Caller holds _lock."""
+    data = {
+        "thread_id": _sessions.get(DEFAULT_SESSION),
+        "sessions": {sid: tid for sid, tid in _sessions.items() if sid != DEFAULT_SESSION},
+    }
+    tmp_path = f"{THREAD_FILE}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(data, f, indent=4)
+    os.replace(tmp_path, THREAD_FILE)
+
+
+def lookup(session_id=None):
+    """Return the thread ID bound to a session, or None."""
+    session_id = session_id or DEFAULT_SESSION
+    with _lock:
+        _load()
+        thread_id = _sessions.get(session_id)
+        if thread_id:
+            _sessions.move_to_end(session_id)
+        return thread_id
+
+
+def bind(session_id, thread_id):
+    """Bind a session to a thread and persist the mapping."""
+    session_id = session_id or DEFAULT_SESSION
+    with _lock:
+        _load()
+        _sessions[session_id] = thread_id
+        _sessions.move_to_end(session_id)
+        while len(_sessions) > MAX_SESSIONS:
+            _sessions.popitem(last=False)
+        _persist()
+    print(f"✅ Thread {thread_id} bound to session {session_id}")
+
+
+def rebind(session_id, old_thread_id, new_thread_id):
+    """Move a session to new_thread_id only if it is still bound to old_thread_id; returns whether it moved."""
+    session_id = session_id or DEFAULT_SESSION
+    with _lock:
+        _load()
+        if _sessions.get(session_id) != old_thread_id:
+            return False
+        _sessions[session_id] = new_thread_id
+        _sessions.move_to_end(session_id)
+        _persist()
+    print(f"✅ Thread {new_thread_id} bound to session {session_id}")
+    return True
+
+
+def get_or_create(session_id, create_thread):
+    """
+    Return the session's thread, calling create_thread() (which must return a
+    thread ID or None) at most once per session when it has none yet.
+    """
+    session_id = session_id or DEFAULT_SESSION
+    thread_id = lookup(session_id)
+    if thread_id:
+        return thread_id
+
+    def create():
+        existing = lookup(session_id)
+        if existing:
+            return existing
+        new_thread_id = create_thread()
+        if new_thread_id:
+            bind(session_id, new_thread_id)
+        return new_thread_id
+
+    return _creation_flight.do(session_id, create)
+
+
+def reset():
+    """Forget every session's thread (e.g. after the knowledge base changes)."""
+    with _lock:
+        _load()
+        _sessions.clear()
+        _persist()
+
+
+def thread_lock(thread_id):
+    """
+    Lock that serialises runs on one thread. Every caller gets the same lock for
+    as long as anyone still references it; unused locks are dropped automatically.
+    """
+    with _lock:
+        lock = _thread_locks.get(thread_id)
+        if lock is None:
+            lock = _thread_locks[thread_id] = threading.Lock()
+        return lock
+
+
+def get_stats():
+    with _lock:
+        _load()
+        return {
+            "sessions": len(_sessions),
+            "threads": len(set(_sessions.values())),
+            "busy_threads": sum(1 for lock in list(_thread_locks.values()) if lock.locked()),
+        }
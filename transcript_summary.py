@@ -0,0 +1,150 @@
+import os
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+
+# Map-reduce summarization for long meeting transcripts. The transcript is cut
+# into segments at line breaks, segments are summarized concurrently on a
+# bounded pool (map), and the partial summaries are combined in groups until a
+# single summary is left (reduce). RollingSummary keeps segment summaries as
+# clips arrive, so summarizing again only pays for the new part.
+#
+# `summarize` is any callable (instruction, text) -> str, which keeps this
+# module independent of the OpenAI client in use.
+
+SUMMARY_WORKERS = int(os.getenv("SUMMARY_WORKERS", "4"))
+SEGMENT_WORDS = int(os.getenv("SUMMARY_SEGMENT_WORDS", "1200"))
+REDUCE_FAN_IN = int(os.getenv("SUMMARY_REDUCE_FAN_IN", "6"))
+
+SEGMENT_PROMPT = (
+    "Summarize this part of a board meeting transcript. Keep decisions, votes, "
+    "action items with owners, figures and open questions. Be concise."
+)
+COMBINE_PROMPT = (
+    "These are summaries of consecutive parts of one board meeting. Merge them into "
+    "one concise summary, keeping decisions, votes, action items and open questions."
+)
+FINAL_PROMPT = (
+    "These are summaries of consecutive parts of one board meeting. Write the final "
+    "meeting summary: key discussion points, decisions and votes, then action items."
+)
+
+_executor = ThreadPoolExecutor(max_workers=SUMMARY_WORKERS, thread_name_prefix="summary")
+
+
+def split_segments(text, segment_words=SEGMENT_WORDS):
+    """Split a transcript into segments of at most `segment_words` words, at line breaks where possible."""
+    segments, current, count = [], [], 0
+
+    def flush():
+        nonlocal current, count
+        if current:
+            segments.append("\n".join(current))
+        current, count = [], 0
+
+    for line in text.splitlines():
+        words = line.split()
+        # A single clip longer than a segment is cut on word boundaries
+        while len(words) > segment_words:
+            flush()
+            segments.append(" ".join(words[:segment_words]))
+            words = words[segment_words:]
+        if not words:
+            continue
+        if count + len(words) > segment_words:
+            flush()
+        current.append(" ".join(words))
+        count += len(words)
+    flush()
+    return segments
+
+
+def reduce_summaries(partials, summarize, fan_in=REDUCE_FAN_IN):
+    """Combine partial summaries in groups of `fan_in`, level by level, into one summary."""
+    partials = [p for p in partials if p and p.strip()]
+    if not partials:
+        return ""
+    while len(partials) > 1:
+        groups = [partials[i:i + fan_in] for i in range(0, len(partials), fan_in)]
+        if len(groups) == 1:
+            return summarize(FINAL_PROMPT, "\n\n".join(groups[0]))
+        partials = list(_executor.map(lambda group: summarize(COMBINE_PROMPT, "\n\n".join(group)), groups))
+    return partials[0]
+
+
+def summarize_transcript(transcript, summarize, segment_words=SEGMENT_WORDS):
+    """One-shot map-reduce summary of a whole transcript."""
+    segments = split_segments(transcript, segment_words)
+    partials = list(_executor.map(lambda segment: summarize(SEGMENT_PROMPT, segment), segments))
+    return reduce_summaries(partials, summarize)
+
+
+class RollingSummary:
+    """
+    Incremental summary of a transcript that only grows at the end.
+
+    update() hands every completed segment to the pool in the background;
+    summary() waits for those, summarizes the unsegmented tail and reduces.
+    A repeated summary() with no new text returns the previous result.
+    """
+
+    def __init__(self, summarize, segment_words=SEGMENT_WORDS):
+        self.summarize = summarize
+        self.segment_words = segment_words
+        self._lock = threading.Lock()
+        self._reset()
+
+    def _reset(self):
+        self._consumed = ""   # transcript prefix already split into segments (or pending)
+        self._pending = ""    # complete lines not yet forming a full segment
+        self._segments = []   # [(segment_text, Future)] in transcript order
+        self._last = None     # (segment count, tail, summary)
+
+    def _submit(self, segment):
+        self._segments.append((segment, _executor.submit(self.summarize, SEGMENT_PROMPT, segment)))
+
+    def update(self, transcript):
+        """Queue summaries for any segments completed since the last call; returns how many."""
+        with self._lock:
+            if not transcript.startswith(self._consumed):
+                self._reset()  # transcript was cleared or edited: start over
+            closed_end = transcript.rfind("\n") + 1
+            if closed_end <= len(self._consumed):
+                return 0
+            self._pending += transcript[len(self._consumed):closed_end]
+            self._consumed = transcript[:closed_end]
+
+            segments = split_segments(self._pending, self.segment_words)
+            if sum(len(s.split()) for s in segments) < self.segment_words:
+                return 0
+            # The last segment may still grow with the next clip; keep it pending
+            done, self._pending = segments[:-1], segments[-1] + "\n"
+            if len(segments[-1].split()) >= self.segment_words:
+                done, self._pending = segments, ""
+            for segment in done:
+                self._submit(segment)
+            return len(done)
+
+    def _segment_summary(self, index):
+        segment, future = self._segments[index]
+        try:
+            return future.result()
+        except Exception as e:
+            print(f"⚠️ Segment summary failed, retrying: {e}")
+            retry = Future()
+            retry.set_result(self.summarize(SEGMENT_PROMPT, segment))
+            self._segments[index] = (segment, retry)
+            return retry.result()
+
+    def summary(self, transcript):
+        """Summary of the whole transcript, reusing every segment summarized so far."""
+        self.update(transcript)
+        with self._lock:
+            tail = (self._pending + transcript[len(self._consumed):]).strip()
+            if self._last and self._last[:2] == (len(self._segments), tail):
+                return self._last[2]
+            partials = [self._segment_summary(i) for i in range(len(self._segments))]
+            if tail:
+                partials.append(self.summarize(SEGMENT_PROMPT, tail))
+            result = reduce_summaries(partials, self.summarize)
+            self._last = (len(self._segments), tail, result)
+            return result
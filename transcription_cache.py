@@ -0,0 +1,121 @@
+import os
+import sqlite3
+import threading
+import time
+
+# Persistent cache of Whisper transcriptions, keyed by the sha256 of the
+# uploaded audio plus model and language; clips are only preprocessed on a
+# miss, so a hit costs one hash and one lookup. Recorder retries and duplicate
+# submissions of the same clip are answered locally instead of paying another
+# upstream round trip. Entries expire after TRANSCRIPTION_CACHE_TTL seconds and
+# the least recently used ones are evicted beyond TRANSCRIPTION_CACHE_MAX_ENTRIES.
+
+TRANSCRIPTION_CACHE_DB = os.getenv("TRANSCRIPTION_CACHE_DB", "transcription_cache.db")
+TRANSCRIPTION_CACHE_TTL = int(os.getenv("TRANSCRIPTION_CACHE_TTL", str(7 * 24 * 3600)))
+TRANSCRIPTION_CACHE_MAX_ENTRIES = int(os.getenv("TRANSCRIPTION_CACHE_MAX_ENTRIES", "5000"))
+
+_local = threading.local()
+_init_lock = threading.Lock()
+_initialized = False
+_stats_lock = threading.Lock()
+_stats = {"hits": 0, "misses": 0, "expired": 0, "evicted": 0, "saved_seconds": 0.0}
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS transcriptions (
+    audio_hash TEXT NOT NULL,
+    model TEXT NOT NULL,
+    language TEXT NOT NULL,
+    text TEXT NOT NULL,
+    upstream_seconds REAL NOT NULL,
+    created_at REAL NOT NULL,
+    last_used REAL NOT NULL,
+    PRIMARY KEY (audio_hash, model, language)
+);
+CREATE INDEX IF NOT EXISTS idx_transcriptions_last_used ON transcriptions (last_used);
+"""
+
+
+def _connect():
+    conn = sqlite3.connect(TRANSCRIPTION_CACHE_DB, timeout=30)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    return conn
+
+
+def get_connection():
+    """Per-thread connection; the schema is created once per process."""
+    global _initialized
+    conn = getattr(_local, "conn", None)
+    if conn is None:
+        conn = _local.conn = _connect()
+    if not _initialized:
+        with _init_lock:
+            if not _initialized:
+                with conn:
+                    conn.executescript(_SCHEMA)
+                _initialized = True
+    return conn
+
+
+def get(audio_hash, model, language):
+    """Return the cached transcription, or None on a miss or expired entry."""
+    conn = get_connection()
+    now = time.time()
+    key = (audio_hash, model, language or "")
+    with conn:
+        row = conn.execute(
+            "SELECT text, upstream_seconds, created_at FROM transcriptions "
+            "WHERE audio_hash = ? AND model = ? AND language = ?", key,
+        ).fetchone()
+        if row is not None and now - row[2] > TRANSCRIPTION_CACHE_TTL:
+            conn.execute("DELETE FROM transcriptions WHERE audio_hash = ? AND model = ? AND language = ?", key)
+            with _stats_lock:
+                _stats["expired"] += 1
+            row = None
+        if row is None:
+            with _stats_lock:
+                _stats["misses"] += 1
+            return None
+        conn.execute(
+            "UPDATE transcriptions SET last_used = ? WHERE audio_hash = ? AND model = ? AND language = ?",
+            (now,) + key,
+        )
+    with _stats_lock:
+        _stats["hits"] += 1
+        _stats["saved_seconds"] += row[1]
+    return row[0]
+
+
+def put(audio_hash, model, language, text, upstream_seconds):
+    """Store a transcription along with how long the upstream call took."""
+    conn = get_connection()
+    now = time.time()
+    with conn:
+        conn.execute(
+            "INSERT OR REPLACE INTO transcriptions "
+            "(audio_hash, model, language, text, upstream_seconds, created_at, last_used) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (audio_hash, model, language or "", text, upstream_seconds, now, now),
+        )
+        conn.execute("DELETE FROM transcriptions WHERE created_at < ?", (now - TRANSCRIPTION_CACHE_TTL,))
+        evicted = conn.execute(
+            "DELETE FROM transcriptions WHERE rowid IN ("
+            "SELECT rowid FROM transcriptions ORDER BY last_used DESC LIMIT -1 OFFSET ?)",
+            (TRANSCRIPTION_CACHE_MAX_ENTRIES,),
+        ).rowcount
+    if evicted:
+        with _stats_lock:
+            _stats["evicted"] += evicted
+
+
+def get_stats():
+    conn = get_connection()
+    entries = conn.execute("SELECT COUNT(*) FROM transcriptions").fetchone()[0]
+    with _stats_lock:
+        lookups = _stats["hits"] + _stats["misses"]
+        return dict(
+            _stats,
+            saved_seconds=round(_stats["saved_seconds"], 2),
+            entries=entries,
+            hit_rate=round(_stats["hits"] / lookups, 3) if lookups else 0.0,
+        )
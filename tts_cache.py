@@ -0,0 +1,125 @@
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+
+# Content-addressed cache of synthesized speech. Files are named by the sha256
+# of (text, voice, model, instructions), so repeated answers are served from
+# disk without an API call. Total size is capped with LRU eviction; hits bump
+# the file's access time so the LRU order survives a restart.
+
+TTS_CACHE_DIR = os.getenv("TTS_CACHE_DIR", os.path.join("audio_files", "tts_cache"))
+TTS_CACHE_MAX_BYTES = int(os.getenv("TTS_CACHE_MAX_BYTES", str(500 * 1024 * 1024)))
+
+_lock = threading.Lock()
+_entries = OrderedDict()  # key -> size in bytes, least recently used first
+_total_bytes = 0
+_stats = {"hits": 0, "misses": 0, "evictions": 0}
+_loaded = False
+
+
+def cache_key(text, voice, model, instructions):
+    """Stable hash of everything that determines the synthesized audio."""
+    payload = json.dumps([text, voice, model, instructions], ensure_ascii=False)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def _path(key):
+    return os.path.join(TTS_CACHE_DIR, f"{key}.mp3")
+
+
+def _load():
+    """Index files already on disk, least recently used (oldest atime) first. Caller holds _lock."""
+    global _loaded, _total_bytes
+    if _loaded:
+        return
+    os.makedirs(TTS_CACHE_DIR, exist_ok=True)
+    found = []
+    for entry in os.scandir(TTS_CACHE_DIR):
+        if entry.is_file() and entry.name.endswith(".mp3"):
+            stat = entry.stat()
+            found.append((stat.st_atime, entry.name[:-len(".mp3")], stat.st_size))
+    for _, key, size in sorted(found):
+        _entries[key] = size
+        _total_bytes += size
+    _loaded = True
+    _evict()
+
+
+def _evict():
+    """Drop least recently used files until under budget. Caller holds _lock."""
+    global _total_bytes
+    while _total_bytes > TTS_CACHE_MAX_BYTES and len(_entries) > 1:
+        key, size = _entries.popitem(last=False)
+        _total_bytes -= size
+        _stats["evictions"] += 1
+        try:
+            os.remove(_path(key))
+        except FileNotFoundError:
+            pass
+
+
+def get_path(key):
+    """Return the cached file path for key (marking it recently used), or None."""
+    global _total_bytes
+    with _lock:
+        _load()
+        if key in _entries and os.path.exists(_path(key)):
+            _entries.move_to_end(key)
+            _stats["hits"] += 1
+            try:
+                # Access time only: the mtime is part of the file's ETag
+                os.utime(_path(key), ns=(time.time_ns(), os.stat(_path(key)).st_mtime_ns))
+            except OSError:
+                pass
+            return _path(key)
+        if key in _entries:
+            # Removed from disk behind our back
+            _total_bytes -= _entries.pop(key)
+        _stats["misses"] += 1
+        return None
+
+
+def get_bytes(key):
+    """Return the cached audio bytes for key, or None on a miss."""
+    path = get_path(key)
+    if path is None:
+        return None
+    try:
+        with open(path, "rb") as f:
+            return f.read()
+    except FileNotFoundError:
+        return None
+
+
+def put(key, audio_bytes):
+    """Store audio bytes under key and return the cached file path."""
+    global _total_bytes
+    path = _path(key)
+    with _lock:
+        _load()
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(audio_bytes)
+        os.replace(tmp_path, path)
+        if key in _entries:
+            _total_bytes -= _entries[key]
+        _entries[key] = len(audio_bytes)
+        _entries.move_to_end(key)
+        _total_bytes += len(audio_bytes)
+        _evict()
+    return path
+
+
+def get_stats():
+    with _lock:
+        lookups = _stats["hits"] + _stats["misses"]
+        return dict(
+            _stats,
+            entries=len(_entries),
+            bytes=_total_bytes,
+            max_bytes=TTS_CACHE_MAX_BYTES,
+            hit_rate=round(_stats["hits"] / lookups, 3) if lookups else 0.0,
+        )
@@ -0,0 +1,87 @@
+import os
+import re
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+# Sentence-pipelined text-to-speech. The reply is split into sentences that are
+# synthesized concurrently (a bounded window per reply), and the audio chunks
+# are yielded strictly in order so playback can start after the first sentence.
+
+TTS_STREAM_POOL_SIZE = int(os.getenv("TTS_STREAM_POOL_SIZE", "8"))
+TTS_STREAM_PARALLEL = int(os.getenv("TTS_STREAM_PARALLEL", "3"))
+MIN_SENTENCE_CHARS = 20
+MAX_SENTENCE_CHARS = 400
+
+_SENTENCE_END = re.compile(r"(?<=[.!?])\s+|\n+")
+_executor = ThreadPoolExecutor(max_workers=TTS_STREAM_POOL_SIZE, thread_name_prefix="tts-stream")
+
+
+def _split_long(sentence):
+    """Break an over-long sentence at commas/spaces so no piece exceeds MAX_SENTENCE_CHARS."""
+    pieces = []
+    while len(sentence) > MAX_SENTENCE_CHARS:
+        cut = sentence.rfind(", ", 0, MAX_SENTENCE_CHARS)
+        if cut <= 0:
+            cut = sentence.rfind(" ", 0, MAX_SENTENCE_CHARS)
+        if cut <= 0:
+            cut = MAX_SENTENCE_CHARS
+        else:
+            cut += 1  # keep the comma with the first piece
+        pieces.append(sentence[:cut].strip())
+        sentence = sentence[cut:].strip()
+    if sentence:
+        pieces.append(sentence)
+    return pieces
+
+
+def split_sentences(text):
+    """
+    Split text into speakable chunks. Fragments shorter than MIN_SENTENCE_CHARS
+    are merged into the following sentence so the API isn't called per word.
+    """
+    chunks, pending = [], ""
+    for raw in _SENTENCE_END.split(text or ""):
+        raw = raw.strip()
+        if not raw:
+            continue
+        pending = f"{pending} {raw}".strip() if pending else raw
+        if len(pending) >= MIN_SENTENCE_CHARS:
+            chunks.extend(_split_long(pending))
+            pending = ""
+    if pending:
+        if chunks and len(chunks[-1]) + len(pending) < MAX_SENTENCE_CHARS:
+            chunks[-1] = f"{chunks[-1]} {pending}"
+        else:
+            chunks.append(pending)
+    return chunks
+
+
+def stream_speech(text, synthesize, parallel=TTS_STREAM_PARALLEL):
+    """
+    Yield audio bytes for `text` sentence by sentence, in order.
+
+    `synthesize(sentence)` must return the encoded audio bytes (or None on
+    failure, in which case that sentence is skipped). At most `parallel`
+    sentences of this reply are in flight at once.
+    """
+    sentences = iter(split_sentences(text))
+    in_flight = deque()
+
+    def fill():
+        while len(in_flight) < max(1, parallel):
+            sentence = next(sentences, None)
+            if sentence is None:
+                return
+            in_flight.append(_executor.submit(synthesize, sentence))
+
+    fill()
+    try:
+        while in_flight:
+            audio = in_flight.popleft().result()
+            fill()
+            if audio:
+                yield audio
+    finally:
+        # Client went away mid-stream: don't keep synthesizing for nobody.
+        for future in in_flight:
+            future.cancel()
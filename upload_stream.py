@@ -0,0 +1,169 @@
+import hashlib
+import mimetypes
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from requests_toolbelt import MultipartEncoder
+
+import openai_client
+
+# Constant-memory ingestion of uploaded documents into OpenAI.
+# The incoming file stream is read once, in fixed-size chunks: each chunk is
+# hashed, teed to the local copy and sent upstream. Small files go through a
+# streamed multipart POST to /files; files above UPLOADS_API_THRESHOLD use the
+# Uploads API (create, add parts in parallel, complete). Peak memory is
+# roughly UPLOAD_PART_PARALLEL * UPLOAD_PART_SIZE regardless of file size.
+
+UPLOADS_API_THRESHOLD = int(os.getenv("UPLOADS_API_THRESHOLD", str(20 * 1024 * 1024)))
+UPLOAD_PART_SIZE = int(os.getenv("UPLOAD_PART_SIZE", str(8 * 1024 * 1024)))
+UPLOAD_PART_PARALLEL = int(os.getenv("UPLOAD_PART_PARALLEL", "4"))
+
+_part_executor = ThreadPoolExecutor(max_workers=UPLOAD_PART_PARALLEL * 2, thread_name_prefix="upload-part")
+
+
+class UploadError(Exception):
+    """Raised when OpenAI rejects an upload step."""
+
+
+class HashingReader:
+    """
+    File-like wrapper that hashes (and optionally tees to disk) every byte
+    read from `stream`. Exposes __len__ (bytes remaining) and tell so
+    MultipartEncoder can stream it.
+    """
+
+    def __init__(self, stream, size, tee_path=None):
+        self._stream = stream
+        self._size = size
+        self._position = 0
+        self._digest = hashlib.sha256()
+        self._tee = open(tee_path, "wb") if tee_path else None
+
+    def read(self, size=-1):
+        chunk = self._stream.read(size)
+        if chunk:
+            self._position += len(chunk)
+            self._digest.update(chunk)
+            if self._tee:
+                self._tee.write(chunk)
+        return chunk
+
+    def __len__(self):
+        # Bytes still to read: MultipartEncoder keeps reading while this is > 0
+        return self._size - self._position
+
+    def tell(self):
+        return self._position
+
+    def hexdigest(self):
+        return self._digest.hexdigest()
+
+    def close(self):
+        if self._tee:
+            self._tee.close()
+            self._tee = None
+
+
+def stream_size(stream):
+    """Size of a seekable stream without reading it (werkzeug spools uploads to a temp file)."""
+    position = stream.tell()
+    stream.seek(0, os.SEEK_END)
+    size = stream.tell() - position
+    stream.seek(position)
+    return size
+
+
+def hash_stream(stream, chunk_size=1024 * 1024):
+    """sha256 of a seekable stream's remaining bytes; the position is restored afterwards."""
+    position = stream.tell()
+    digest = hashlib.sha256()
+    for chunk in iter(lambda: stream.read(chunk_size), b""):
+        digest.update(chunk)
+    stream.seek(position)
+    return digest.hexdigest()
+
+
+def guess_mime_type(file_name, fallback="application/octet-stream"):
+    return mimetypes.guess_type(file_name)[0] or fallback
+
+
+def _upload_small(reader, file_name, mime_type):
+    encoder = MultipartEncoder(fields={
+        "purpose": "assistants",
+        "file": (file_name, reader, mime_type),
+    })
+    response = openai_client.post("/files", data=encoder, headers={"Content-Type": encoder.content_type})
+    if response.status_code != 200:
+        raise UploadError(response.json().get("error", "Unknown error"))
+    return response.json()["id"]
+
+
+def _add_part(upload_id, index, data):
+    response = openai_client.post(f"/uploads/{upload_id}/parts", files={"data": (f"part-{index}", data)})
+    if response.status_code != 200:
+        raise UploadError(f"Part {index} rejected: {response.text}")
+    return response.json()["id"]
+
+
+def _upload_large(reader, file_name, mime_type, size):
+    response = openai_client.post("/uploads", json={
+        "purpose": "assistants",
+        "filename": file_name,
+        "bytes": size,
+        "mime_type": mime_type,
+    })
+    if response.status_code != 200:
+        raise UploadError(f"Failed to create upload: {response.text}")
+    upload_id = response.json()["id"]
+
+    # Read parts sequentially (the hash must see bytes in order) but send them
+    # concurrently; the semaphore bounds how many parts sit in memory at once.
+    in_flight = threading.BoundedSemaphore(UPLOAD_PART_PARALLEL)
+    futures = []
+    try:
+        index = 0
+        while True:
+            in_flight.acquire()
+            data = reader.read(UPLOAD_PART_SIZE)
+            if not data:
+                in_flight.release()
+                break
+            future = _part_executor.submit(_add_part, upload_id, index, data)
+            future.add_done_callback(lambda _: in_flight.release())
+            futures.append(future)
+            index += 1
+        part_ids = [future.result() for future in futures]
+
+        response = openai_client.post(f"/uploads/{upload_id}/complete", json={"part_ids": part_ids})
+        if response.status_code != 200:
+            raise UploadError(f"Failed to complete upload: {response.text}")
+        return response.json()["file"]["id"]
+    except Exception:
+        for future in futures:
+            future.cancel()
+        try:
+            openai_client.post(f"/uploads/{upload_id}/cancel")
+        except Exception as e:
+            print(f"⚠️ Could not cancel upload {upload_id}: {e}")
+        raise
+
+
+def upload_stream(stream, file_name, local_path=None, mime_type=None):
+    """
+    Stream a file into OpenAI (purpose=assistants), hashing it on the way.
+
+    Returns {"file_id", "sha256", "bytes"}. If local_path is given, the same
+    pass also writes the local copy. Raises UploadError on API failure.
+    """
+    size = stream_size(stream)
+    mime_type = guess_mime_type(file_name, mime_type or "application/octet-stream")
+    reader = HashingReader(stream, size, local_path)
+    try:
+        if size >= UPLOADS_API_THRESHOLD:
+            file_id = _upload_large(reader, file_name, mime_type, size)
+        else:
+            file_id = _upload_small(reader, file_name, mime_type)
+    finally:
+        reader.close()
+    return {"file_id": file_id, "sha256": reader.hexdigest(), "bytes": size}